@@ -0,0 +1,166 @@
+import heapq
+import itertools
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from app.services.rate_limit import request_priority
+
+
+MB = 1024 * 1024
+
+# Memory the OCR work of this process may use at once; 0 disables admission
+# control (usage is still tracked). Each worker process has its own budget.
+PROCESSING_MEMORY_BUDGET_MB = int(os.getenv("PROCESSING_MEMORY_BUDGET_MB", 1024))
+# Bytes per rendered pixel at the peak of a page: the 8-bit grayscale render,
+# the preprocessing copy alive next to it and Tesseract's own working images
+OCR_BYTES_PER_PIXEL = float(os.getenv("OCR_BYTES_PER_PIXEL", 4))
+# Per document: the open MuPDF document, its resource store and the text
+JOB_BASE_BYTES = 16 * MB
+PAGE_OVERHEAD_BYTES = 64 * 1024
+
+
+def estimate_page_bytes(width: float, height: float, dpi: int) -> int:
+    """
+    Peak memory of rendering and OCR-ing one page of `width` x `height`
+    points (1/72 inch) at `dpi`.
+    """
+    pixels = (width * dpi / 72.0) * (height * dpi / 72.0)
+    return int(pixels * OCR_BYTES_PER_PIXEL)
+
+
+def estimate_job_bytes(pdf_path: str, dpi: int) -> int:
+    """
+    Peak memory of OCR-ing a whole PDF with `extract_pdf_content`: pages are
+    processed one after another, so the largest page dominates, plus a small
+    amount per page for thumbnails and text. Reads only the page tree, not
+    the page contents.
+    """
+    import fitz
+
+    with fitz.open(pdf_path, filetype="pdf") as doc:
+        largest = 0
+        for page in doc:
+            largest = max(largest, estimate_page_bytes(page.rect.width, page.rect.height, dpi))
+        return JOB_BASE_BYTES + len(doc) * PAGE_OVERHEAD_BYTES + largest
+
+
+class MemoryBudget:
+    """
+    Admission control for memory-heavy work within one process.
+
+    Callers reserve their estimated peak memory before starting and release
+    it afterwards; a reservation that does not fit next to the ones already
+    admitted waits. Waiters are admitted strictly by (priority, arrival), so
+    a large page cannot be starved by a stream of small ones and interactive
+    work goes before batch work. A reservation larger than the whole budget
+    is capped at the budget, i.e. it runs alone.
+    """
+
+    def __init__(self, budget_bytes: int):
+        self.budget = budget_bytes
+        self._cond = threading.Condition()
+        self._in_use = 0
+        self._active = 0
+        self._waiters = []  # heap of (priority, ticket)
+        self._tickets = itertools.count()
+        self._peak = 0
+        self._admitted = 0
+        self._waited = 0
+        self._wait_seconds = 0.0
+
+    def _cap(self, nbytes: int) -> int:
+        return min(nbytes, self.budget) if self.budget else nbytes
+
+    def _fits(self, nbytes: int) -> bool:
+        return not self.budget or self._in_use + nbytes <= self.budget
+
+    def _admit(self, nbytes: int):
+        self._in_use += nbytes
+        self._active += 1
+        self._admitted += 1
+        self._peak = max(self._peak, self._in_use)
+
+    def try_acquire(self, nbytes: int) -> int | None:
+        """
+        Reserve `nbytes` if that fits now and nobody is waiting; returns the
+        reserved amount (pass it to `release`) or None.
+        """
+        nbytes = self._cap(nbytes)
+        with self._cond:
+            if self._waiters or not self._fits(nbytes):
+                return None
+            self._admit(nbytes)
+            return nbytes
+
+    def acquire(self, nbytes: int, priority=None, timeout=None) -> int:
+        """
+        Block until `nbytes` fit into the budget and it is this caller's
+        turn; returns the reserved amount (pass it to `release`).
+
+        Raises:
+            TimeoutError: If the reservation was not admitted within `timeout` seconds.
+        """
+        nbytes = self._cap(nbytes)
+        priority = request_priority.get() if priority is None else priority
+        with self._cond:
+            if not self._waiters and self._fits(nbytes):
+                self._admit(nbytes)
+                return nbytes
+
+            entry = (priority, next(self._tickets))
+            heapq.heappush(self._waiters, entry)
+            self._waited += 1
+            start = time.monotonic()
+            deadline = None if timeout is None else start + timeout
+            try:
+                while self._waiters[0] != entry or not self._fits(nbytes):
+                    remaining = None if deadline is None else deadline - time.monotonic()
+                    if remaining is not None and remaining <= 0:
+                        raise TimeoutError(f"{nbytes / MB:.0f} MB of processing memory not available in time.")
+                    self._cond.wait(remaining)
+                self._admit(nbytes)
+            finally:
+                self._waiters.remove(entry)
+                heapq.heapify(self._waiters)
+                self._wait_seconds += time.monotonic() - start
+                # The next waiter may fit now (or be first after a timeout)
+                self._cond.notify_all()
+            return nbytes
+
+    def release(self, nbytes: int):
+        with self._cond:
+            self._in_use -= nbytes
+            self._active -= 1
+            self._cond.notify_all()
+
+    @contextmanager
+    def reserve(self, nbytes: int, priority=None):
+        """
+        Hold a reservation of `nbytes` for the duration of the block.
+        """
+        reserved = self.acquire(nbytes, priority)
+        try:
+            yield reserved
+        finally:
+            self.release(reserved)
+
+    def usage(self) -> dict:
+        """
+        Current and cumulative budget usage, in MB where applicable.
+        """
+        with self._cond:
+            return {
+                "budget_mb": round(self.budget / MB, 1),
+                "in_use_mb": round(self._in_use / MB, 1),
+                "peak_mb": round(self._peak / MB, 1),
+                "active": self._active,
+                "queued": len(self._waiters),
+                "admitted_total": self._admitted,
+                "waited_total": self._waited,
+                "wait_seconds_total": round(self._wait_seconds, 3),
+            }
+
+
+memory_budget = MemoryBudget(PROCESSING_MEMORY_BUDGET_MB * MB)
@@ -0,0 +1,394 @@
+import json
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, FIRST_COMPLETED, wait
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime, timezone
+
+from app.services.admission import memory_budget, estimate_job_bytes, estimate_page_bytes, JOB_BASE_BYTES, MB
+from app.services.pdf_processing import extract_pdf_content, _file_sha256, OCR_DPI
+from app.services.pipeline import process_document, stage_versions, stale_stages, store_artifact
+from app.services.rate_limit import request_priority, PRIORITY_BATCH
+from utils.helpers import generate_unique_id
+
+
+def discover_pdfs(source: str) -> list:
+    """
+    Return the PDF paths to backfill: every *.pdf below a directory (sorted),
+    or the entries of a manifest file with one path per line. Relative
+    manifest paths are resolved against the manifest's directory; blank
+    lines and lines starting with '#' are ignored.
+    """
+    if os.path.isdir(source):
+        paths = []
+        for root, _, files in os.walk(source):
+            paths.extend(os.path.join(root, name) for name in files if name.lower().endswith('.pdf'))
+        return sorted(paths)
+
+    base = os.path.dirname(os.path.abspath(source))
+    with open(source, encoding='utf-8') as manifest:
+        return [
+            os.path.join(base, line.strip())
+            for line in manifest
+            if line.strip() and not line.lstrip().startswith('#')
+        ]
+
+
+class Checkpoint:
+    """
+    Append-only JSONL log of finished documents.
+
+    One line per document and outcome; a re-run skips every path or content
+    hash already recorded as 'done', so an interrupted backfill resumes
+    where it stopped. Failed documents are retried on the next run.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.done_paths = set()
+        self.done_hashes = set()
+        if os.path.exists(path):
+            with open(path, encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue  # partially written last line of a killed run
+                    if record.get('status') == 'done':
+                        self.done_paths.add(record.get('path'))
+                        self.done_hashes.add(record.get('sha256'))
+        self._file = open(path, 'a', encoding='utf-8')
+        self._lock = threading.Lock()
+
+    def is_done(self, path, sha256=None):
+        return path in self.done_paths or (sha256 is not None and sha256 in self.done_hashes)
+
+    def record(self, path, status, **fields):
+        entry = {'path': path, 'status': status, 'time': datetime.now(timezone.utc).isoformat(), **fields}
+        with self._lock:
+            self._file.write(json.dumps(entry) + '\n')
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            if status == 'done':
+                self.done_paths.add(path)
+                self.done_hashes.add(fields.get('sha256'))
+
+    def close(self):
+        self._file.close()
+
+
+class BackfillStats:
+    """
+    Counters and stage timings for the end-of-run summary.
+    """
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self.found = 0
+        self.skipped = 0
+        self.processed = 0
+        self.failures = []
+        self.pages = 0
+        self.ocr_seconds = 0.0
+        self.ocr_runs = 0
+        self.provider_seconds = 0.0
+        self.provider_runs = 0
+        self.memory_queued = 0  # OCR jobs that waited for the memory budget
+        self.memory_wait_seconds = 0.0
+        self.memory = None  # memory_budget.usage() at the end of the run
+
+    def summary(self) -> str:
+        elapsed = time.monotonic() - self.started
+        minutes = elapsed / 60 or 1
+        lines = [
+            f"Backfill finished in {int(elapsed // 60)}m{int(elapsed % 60):02d}s",
+            f"  documents: {self.found} found, {self.skipped} skipped, "
+            f"{self.processed} processed, {len(self.failures)} failed",
+            f"  throughput: {self.processed / minutes:.1f} documents/min, "
+            f"{self.pages / (elapsed or 1):.2f} OCR pages/s",
+            f"  mean stage time: OCR {self.ocr_seconds / (self.ocr_runs or 1):.1f}s "
+            f"({self.ocr_runs} runs), providers {self.provider_seconds / (self.provider_runs or 1):.1f}s "
+            f"({self.provider_runs} runs)",
+        ]
+        if self.memory:
+            lines.append(
+                f"  OCR memory: peak {self.memory['peak_mb']:.0f} of {self.memory['budget_mb'] or 'unlimited'} MB "
+                f"budget, {self.memory_queued} documents queued for {self.memory_wait_seconds:.0f}s in total"
+            )
+        if self.failures:
+            lines.append("  failures:")
+            lines.extend(f"    {path}: {error}" for path, error in self.failures)
+        return "\n".join(lines)
+
+
+def _ocr_document(path: str, lang: str):
+    """
+    OCR stage, executed in a worker process. Worker processes have no
+    database access, so the shared page cache is not used here.
+    """
+    start = time.monotonic()
+    extracted = extract_pdf_content(path, lang=lang)
+    return extracted, time.monotonic() - start
+
+
+def _provider_stage(app, data_manager, pdf_id: str, lang: str) -> float:
+    """
+    Prompt + provider calls + report writes for one PDF, executed in a
+    thread. Reuses the OCR artifact stored by the main process.
+    """
+    request_priority.set(PRIORITY_BATCH)
+    start = time.monotonic()
+    with app.app_context():
+        entry = data_manager.pdf_manager.get_pdf(pdf_id)
+        process_document(entry, data_manager, hedging=False, lang=lang)
+        data_manager.pdf_manager.update_processing_status(pdf_id, 'processed')
+    return time.monotonic() - start
+
+
+def _ocr_job_bytes(path: str) -> int:
+    try:
+        return estimate_job_bytes(path, OCR_DPI)
+    except Exception:
+        # Unreadable page tree; the OCR worker reports the actual error. Assume A4.
+        return JOB_BASE_BYTES + estimate_page_bytes(595, 842, OCR_DPI)
+
+
+def run_backfill(app, data_manager, paths, user_id, checkpoint, ocr_workers=None, provider_workers=4,
+                 lang="auto", max_tasks_per_child=50, echo=print) -> BackfillStats:
+    """
+    Import and process a list of PDFs outside the web UI.
+
+    The main process stores each PDF, hands OCR to a process pool
+    (`ocr_workers` processes, one per CPU by default) and, once a document's
+    text is stored as its 'extract' artifact, the remaining stages to a
+    thread pool (`provider_workers`; these calls mostly wait on the network
+    and are throttled by the shared rate limiter at batch priority). At most
+    two documents per worker are in flight per stage, so memory stays flat
+    however large the archive is. In addition, an OCR job only starts once
+    its estimated peak memory (see app/services/admission.py) fits into
+    the processing memory budget next to the running ones; until then it
+    waits in a queue.
+
+    Documents already recorded as done in the `checkpoint`, already
+    processed for this user, or repeated within the run (same content hash)
+    are skipped; a document stored by an interrupted run is picked up
+    again, including its OCR artifact if that is still current. If an OCR
+    worker dies (e.g. MuPDF crashing on a malformed file), the pool is
+    recreated and the affected documents are retried once, each in its own
+    process.
+
+    Must be called inside an application context.
+
+    Returns:
+        BackfillStats: Counts and timings; `summary()` formats them.
+    """
+    stats = BackfillStats()
+    versions = stage_versions()
+    ocr_workers = ocr_workers or os.cpu_count() or 1
+    jobs = iter(paths)
+    pending = {}  # future -> (stage, path, sha256, pdf_id)
+    admitted = set()  # content hashes scheduled in this run
+    retries = {}
+    pools = {}
+    isolated = {}  # future -> single-use pool of a retried document
+    ocr_queue = deque()  # OCR jobs waiting for memory: (path, sha256, pdf_id, retry, bytes, queued at)
+    reserved = {}  # future -> memory reserved for its OCR job
+
+    def new_ocr_pool(workers=None):
+        return ProcessPoolExecutor(
+            max_workers=workers or ocr_workers,
+            mp_context=multiprocessing.get_context('spawn'),
+            max_tasks_per_child=max_tasks_per_child,
+        )
+
+    def submit_ocr(path, sha256, pdf_id, retry=False):
+        ocr_queue.append((path, sha256, pdf_id, retry, _ocr_job_bytes(path), time.monotonic()))
+        start_queued_ocr()
+
+    def start_queued_ocr():
+        """
+        Start queued OCR jobs in order for as long as they fit into the memory budget.
+        """
+        while ocr_queue:
+            path, sha256, pdf_id, retry, nbytes, queued_at = ocr_queue[0]
+            granted = memory_budget.try_acquire(nbytes)
+            if granted is None:
+                if any(job[0] == 'ocr' for job in pending.values()):
+                    return  # retried when a running job finishes
+                # Nothing of ours to wait for, only other users of the budget
+                granted = memory_budget.acquire(nbytes, PRIORITY_BATCH)
+            ocr_queue.popleft()
+            waited = time.monotonic() - queued_at
+            if waited > 0.01:
+                stats.memory_queued += 1
+                stats.memory_wait_seconds += waited
+            try:
+                future = start_ocr(path, sha256, pdf_id, retry)
+            except Exception as exc:
+                memory_budget.release(granted)
+                fail(path, sha256, pdf_id, exc)
+                continue
+            reserved[future] = granted
+            logging.debug("OCR of %s admitted with %.0f MB", path, granted / MB)
+
+    def start_ocr(path, sha256, pdf_id, retry):
+        if retry:
+            # A dedicated process, so a document that crashes its worker again
+            # cannot take the documents running next to it down with it
+            pool = new_ocr_pool(workers=1)
+            future = pool.submit(_ocr_document, path, lang)
+            isolated[future] = pool
+            pending[future] = ('ocr', path, sha256, pdf_id)
+            return future
+        try:
+            future = pools['ocr'].submit(_ocr_document, path, lang)
+        except BrokenProcessPool:
+            pools['ocr'].shutdown(wait=False, cancel_futures=True)
+            pools['ocr'] = new_ocr_pool()
+            future = pools['ocr'].submit(_ocr_document, path, lang)
+        pending[future] = ('ocr', path, sha256, pdf_id)
+        return future
+
+    def submit_providers(path, sha256, pdf_id):
+        future = pools['providers'].submit(_provider_stage, app, data_manager, pdf_id, lang)
+        pending[future] = ('providers', path, sha256, pdf_id)
+
+    def fail(path, sha256, pdf_id, exc):
+        logging.error("Backfill failed for %s: %s", path, exc)
+        stats.failures.append((path, f"{type(exc).__name__}: {exc}"))
+        checkpoint.record(path, 'failed', sha256=sha256, pdf_id=pdf_id, error=str(exc))
+        if pdf_id is None:
+            return
+        try:
+            data_manager.errorlog_manager.log_error(
+                generate_unique_id(), pdf_id, type(exc).__name__, str(exc), datetime.now(timezone.utc)
+            )
+            data_manager.pdf_manager.update_processing_status(pdf_id, 'error')
+        except Exception:
+            logging.exception("Failed to record backfill error for PDF %s", pdf_id)
+
+    def admit(path):
+        """
+        Store one PDF and schedule its first stale stage; False if skipped.
+        """
+        stats.found += 1
+        if checkpoint.is_done(path):
+            stats.skipped += 1
+            return False
+        pdf_id = sha256 = None
+        try:
+            sha256 = _file_sha256(path)
+            if checkpoint.is_done(path, sha256) or sha256 in admitted:
+                stats.skipped += 1
+                return False
+            admitted.add(sha256)
+
+            existing = data_manager.pdf_manager.get_pdf_by_hash(user_id, sha256)
+            if existing is not None and existing.processing_status == 'processed':
+                checkpoint.record(path, 'done', sha256=sha256, pdf_id=existing.id, existing=True)
+                stats.skipped += 1
+                return False
+
+            if existing is not None:
+                pdf_id = existing.id
+            else:
+                pdf_id = generate_unique_id()
+                data_manager.pdf_manager.add_pdf_file(
+                    id=pdf_id,
+                    user_id=user_id,
+                    original_filename=os.path.basename(path),
+                    upload_date=datetime.now(timezone.utc),
+                    path=path,
+                    processing_status='processing',
+                    content_sha256=sha256
+                )
+
+            if 'extract' in stale_stages(pdf_id, data_manager, versions):
+                submit_ocr(path, sha256, pdf_id)
+            else:
+                submit_providers(path, sha256, pdf_id)
+        except Exception as exc:
+            fail(path, sha256, pdf_id, exc)
+            return False
+        return True
+
+    def in_flight(stage):
+        return sum(1 for job in pending.values() if job[0] == stage)
+
+    pools['ocr'] = new_ocr_pool()
+    pools['providers'] = ThreadPoolExecutor(max_workers=provider_workers, thread_name_prefix='backfill')
+    exhausted = False
+    try:
+        while True:
+            # Keep both pools busy without reading ahead of the slower stage
+            while (not exhausted and in_flight('ocr') + len(ocr_queue) < 2 * ocr_workers
+                   and in_flight('providers') < 2 * provider_workers):
+                path = next(jobs, None)
+                if path is None:
+                    exhausted = True
+                else:
+                    admit(path)
+            if not pending:
+                break
+
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                stage, path, sha256, pdf_id = pending.pop(future)
+                if future in isolated:
+                    isolated.pop(future).shutdown(wait=False)
+                if future in reserved:
+                    memory_budget.release(reserved.pop(future))
+                try:
+                    result = future.result()
+                except BrokenProcessPool as exc:
+                    if retries.get(path, 0) >= 1:
+                        fail(path, sha256, pdf_id, exc)
+                        continue
+                    retries[path] = retries.get(path, 0) + 1
+                    logging.warning("OCR worker died while processing %s; retrying", path)
+                    try:
+                        submit_ocr(path, sha256, pdf_id, retry=True)
+                    except Exception as exc:
+                        fail(path, sha256, pdf_id, exc)
+                    continue
+                except Exception as exc:
+                    fail(path, sha256, pdf_id, exc)
+                    continue
+
+                if stage == 'ocr':
+                    extracted, seconds = result
+                    stats.ocr_runs += 1
+                    stats.ocr_seconds += seconds
+                    stats.pages += sum(1 for page in extracted['pages'] if not page['blank'])
+                    if not extracted.get('raw_text'):
+                        fail(path, sha256, pdf_id, ValueError("No usable text extracted."))
+                        continue
+                    try:
+                        store_artifact(pdf_id, 'extract', extracted, data_manager, versions)
+                    except Exception as exc:
+                        fail(path, sha256, pdf_id, exc)
+                        continue
+                    submit_providers(path, sha256, pdf_id)
+                else:
+                    stats.provider_runs += 1
+                    stats.provider_seconds += result
+                    stats.processed += 1
+                    checkpoint.record(path, 'done', sha256=sha256, pdf_id=pdf_id)
+                    echo(f"  done: {path}")
+            # Finished OCR jobs freed memory for the queued ones
+            start_queued_ocr()
+    finally:
+        for future in pending:
+            future.cancel()
+        for granted in reserved.values():
+            memory_budget.release(granted)
+        for pool in [pools['ocr'], *isolated.values()]:
+            pool.shutdown(cancel_futures=True)
+        pools['providers'].shutdown(cancel_futures=True)
+        stats.memory = memory_budget.usage()
+
+    return stats
@@ -0,0 +1,138 @@
+import csv
+import io
+import json
+from datetime import datetime
+from itertools import islice
+
+
+EXPORT_FORMATS = {
+    # format: (mimetype, file extension)
+    'csv': ('text/csv', 'csv'),
+    'jsonl': ('application/x-ndjson', 'jsonl'),
+    'parquet': ('application/vnd.apache.parquet', 'parquet'),
+}
+
+
+def _batched(rows, batch_size):
+    """
+    Group an iterator of rows into lists of at most `batch_size`.
+    """
+    rows = iter(rows)
+    while True:
+        batch = list(islice(rows, batch_size))
+        if not batch:
+            return
+        yield batch
+
+
+def _iter_csv(rows, columns, batch_size):
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=columns, extrasaction='ignore')
+    writer.writeheader()
+    for batch in _batched(rows, batch_size):
+        writer.writerows(batch)
+        yield buffer.getvalue().encode('utf-8')
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode('utf-8')
+
+
+def _iter_jsonl(rows, batch_size):
+    for batch in _batched(rows, batch_size):
+        lines = [json.dumps(row, default=_json_default, ensure_ascii=False) for row in batch]
+        yield ("\n".join(lines) + "\n").encode('utf-8')
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, bytes):
+        return value.decode('utf-8', errors='replace')
+    return str(value)
+
+
+class _ChunkSink(io.RawIOBase):
+    """
+    Write-only file object that hands out whatever has been written since the
+    last `drain()`, so a Parquet writer can be streamed row group by row group.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._chunks = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def drain(self):
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def _iter_parquet(rows, columns, batch_size):
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError as e:
+        raise RuntimeError("Parquet export requires the 'pyarrow' package.") from e
+
+    # Fixed schema so an all-NULL column in the first batch cannot pin its type
+    types = {'created_at': pa.timestamp('us'), 'value_numeric': pa.float64(), 'percentile': pa.float64()}
+    schema = pa.schema([(c, types.get(c, pa.string())) for c in columns])
+
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(sink, schema, compression='snappy')
+    for batch in _batched(rows, batch_size):
+        table = pa.Table.from_pylist(
+            [{c: _parquet_value(row.get(c), c in types) for c in columns} for row in batch],
+            schema=schema,
+        )
+        writer.write_table(table)
+        chunk = sink.drain()
+        if chunk:
+            yield chunk
+    writer.close()
+    yield sink.drain()
+
+
+def _parquet_value(value, typed):
+    if value is None or typed or isinstance(value, str):
+        return value
+    if isinstance(value, bytes):
+        return value.decode('utf-8', errors='replace')
+    return str(value)
+
+
+def stream_export(rows, columns, fmt, batch_size=500):
+    """
+    Encode an iterator of row dicts as CSV, JSON Lines or Parquet.
+
+    Yields byte chunks of roughly `batch_size` rows each, so the caller can
+    send them to a response or a file without ever holding the whole export
+    in memory.
+
+    Args:
+        rows (iterable[dict]): Rows to export, e.g. from `iter_export_rows()`.
+        columns (sequence[str]): Column order for CSV and Parquet.
+        fmt (str): One of EXPORT_FORMATS.
+        batch_size (int): Rows encoded per chunk (and per Parquet row group).
+    """
+    if fmt == 'csv':
+        return _iter_csv(rows, columns, batch_size)
+    if fmt == 'jsonl':
+        return _iter_jsonl(rows, batch_size)
+    if fmt == 'parquet':
+        return _iter_parquet(rows, columns, batch_size)
+    raise ValueError(f"Unsupported export format: {fmt}")
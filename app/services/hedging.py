@@ -0,0 +1,195 @@
+import contextvars
+import logging
+import os
+import threading
+import time
+from collections import defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+
+# Hedge once the primary is slower than this percentile of its recent calls
+HEDGE_PERCENTILE   = float(os.getenv("HEDGE_PERCENTILE", 0.9))
+# Delay used until enough latency samples have been collected
+HEDGE_DEFAULT_DELAY = float(os.getenv("HEDGE_DEFAULT_DELAY", 20.0))
+HEDGE_MIN_SAMPLES  = int(os.getenv("HEDGE_MIN_SAMPLES", 20))
+HEDGE_TIMEOUT      = float(os.getenv("HEDGE_TIMEOUT", 180.0))
+
+_executor = ThreadPoolExecutor(max_workers=int(os.getenv("HEDGE_WORKERS", 8)), thread_name_prefix="hedge")
+
+
+class HedgeCancelled(Exception):
+    """
+    Raised inside a provider call that was asked to stop because another
+    call of the same hedge has already finished.
+    """
+
+
+class LatencyTracker:
+    """
+    Sliding window of recent call latencies per provider.
+    """
+
+    def __init__(self, window=200):
+        self._samples = defaultdict(lambda: deque(maxlen=window))
+        self._lock = threading.Lock()
+
+    def record(self, provider, seconds):
+        with self._lock:
+            self._samples[provider].append(seconds)
+
+    def percentile(self, provider, q, min_samples=1):
+        """
+        Return the q-quantile (0..1) of the provider's recent latencies, or
+        None if fewer than `min_samples` calls have been recorded.
+        """
+        with self._lock:
+            samples = sorted(self._samples[provider])
+        if len(samples) < max(min_samples, 1):
+            return None
+        index = min(int(q * len(samples)), len(samples) - 1)
+        return samples[index]
+
+
+class HedgeStats:
+    """
+    Counters for hedged calls: how often a hedge was issued and who won.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.hedged = 0
+        self.failures = 0
+        self.wins = defaultdict(int)
+        self.hedge_wins = 0
+
+    def record(self, winner, hedged, hedge_won):
+        with self._lock:
+            self.calls += 1
+            if hedged:
+                self.hedged += 1
+            if winner is None:
+                self.failures += 1
+            else:
+                self.wins[winner] += 1
+            if hedge_won:
+                self.hedge_wins += 1
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "hedged": self.hedged,
+                "hedge_rate": self.hedged / self.calls if self.calls else 0.0,
+                "hedge_wins": self.hedge_wins,
+                "failures": self.failures,
+                "wins": dict(self.wins),
+            }
+
+
+latency_tracker = LatencyTracker()
+hedge_stats = HedgeStats()
+
+
+def _timed(provider, fn, prompt, cancel):
+    start = time.monotonic()
+    try:
+        return fn(prompt, cancel=cancel)
+    finally:
+        latency_tracker.record(provider, time.monotonic() - start)
+
+
+def _hedge_delay(provider):
+    delay = latency_tracker.percentile(provider, HEDGE_PERCENTILE, HEDGE_MIN_SAMPLES)
+    return HEDGE_DEFAULT_DELAY if delay is None else delay
+
+
+def hedged_call(prompt, primary, fallbacks, validate=None, timeout=None):
+    """
+    Call the primary provider and, if it is slow or fails, race a duplicate
+    request against the next fallback provider.
+
+    The hedge is issued once the primary has been running longer than its
+    HEDGE_PERCENTILE latency (HEDGE_DEFAULT_DELAY until enough samples exist),
+    or immediately if the primary raises. The first result that passes
+    `validate` wins. A losing request that has not started is cancelled;
+    one that is running has its cancel event set, which providers check
+    between generated tokens (Qwen) or before each further request
+    (retries, field follow-ups), and then raise HedgeCancelled.
+
+    Args:
+        prompt (str): Prompt sent unchanged to every provider.
+        primary (tuple): (name, callable) of the preferred provider; the
+            callable takes the prompt and a `cancel` threading.Event.
+        fallbacks (list[tuple]): (name, callable) pairs tried in order as hedges.
+        validate (callable): Returns True for a usable result; defaults to accepting any dict.
+        timeout (float): Overall deadline in seconds (HEDGE_TIMEOUT by default).
+
+    Returns:
+        tuple: (provider name, result) of the winning call.
+
+    Raises:
+        The last provider error if no call produced a valid result,
+        TimeoutError if the deadline passed first.
+    """
+    validate = validate or (lambda result: isinstance(result, dict))
+    deadline = time.monotonic() + (timeout or HEDGE_TIMEOUT)
+    queue = list(fallbacks)
+
+    cancels = {}
+
+    def submit(provider, fn):
+        cancel = threading.Event()
+        # Run provider calls in a copy of the caller's context (keeps e.g. the rate-limit priority)
+        future = _executor.submit(contextvars.copy_context().run, _timed, provider, fn, prompt, cancel)
+        cancels[future] = cancel
+        return future
+
+    name, fn = primary
+    pending = {submit(name, fn): name}
+    next_hedge_at = time.monotonic() + _hedge_delay(name)
+    hedged = False
+    last_error = None
+
+    try:
+        while pending or queue:
+            now = time.monotonic()
+            if now >= deadline:
+                hedge_stats.record(None, hedged, False)
+                raise TimeoutError("No provider answered before the hedging deadline.")
+
+            wait_for = deadline - now
+            if queue:
+                wait_for = max(min(wait_for, next_hedge_at - now), 0)
+            done, _ = wait(pending, timeout=wait_for, return_when=FIRST_COMPLETED)
+
+            for future in done:
+                provider = pending.pop(future)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    logging.warning("Provider %s failed: %s", provider, e)
+                    last_error = e
+                    next_hedge_at = time.monotonic()  # hedge right away
+                    continue
+                if validate(result):
+                    hedge_stats.record(provider, hedged, provider != name)
+                    logging.info("Hedged call won by %s (hedged=%s) stats=%s",
+                                 provider, hedged, hedge_stats.snapshot())
+                    return provider, result
+                last_error = ValueError(f"{provider} returned an invalid result.")
+                next_hedge_at = time.monotonic()
+
+            if queue and time.monotonic() >= next_hedge_at:
+                hedge_name, hedge_fn = queue.pop(0)
+                logging.info("Hedging %s with %s", name, hedge_name)
+                pending[submit(hedge_name, hedge_fn)] = hedge_name
+                hedged = True
+                next_hedge_at = time.monotonic() + _hedge_delay(hedge_name)
+    finally:
+        for future in pending:
+            if not future.cancel():
+                cancels[future].set()
+
+    hedge_stats.record(None, hedged, False)
+    raise last_error or RuntimeError("No provider returned a result.")
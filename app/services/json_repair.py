@@ -0,0 +1,176 @@
+import json
+import re
+
+
+_FENCE_RE = re.compile(r"```(?:json)?", re.IGNORECASE)
+_TRAILING_COMMA_RE = re.compile(r",\s*([}\]])")
+
+
+def _scan_and_fix(text: str):
+    """
+    Single pass over a JSON-ish string that
+    - escapes raw newlines/tabs/control characters inside string literals,
+    - drops invalid backslash escapes (e.g. '\\m' -> 'm'),
+    - closes a string and any brackets left open by a truncated response.
+
+    Returns the fixed text and whether the value of the last top-level key
+    was cut off by a truncation. It was not if the text ends between two
+    fields or inside the next key, so a complete last value is kept.
+    """
+    out = []
+    stack = []
+    in_string = False
+    string_start = 0
+    i = 0
+    while i < len(text):
+        ch = text[i]
+        if in_string:
+            if ch == '\\':
+                nxt = text[i + 1] if i + 1 < len(text) else ''
+                if nxt in '"\\/bfnrt':
+                    out.append(ch + nxt)
+                    i += 2
+                    continue
+                if nxt == 'u' and re.fullmatch(r"[0-9a-fA-F]{4}", text[i + 2:i + 6]):
+                    out.append(text[i:i + 6])
+                    i += 6
+                    continue
+                # Invalid escape: keep the character, lose the backslash
+                i += 1
+                continue
+            if ch == '"':
+                in_string = False
+            elif ch == '\n':
+                ch = '\\n'
+            elif ch == '\r':
+                ch = '\\r'
+            elif ch == '\t':
+                ch = '\\t'
+            elif ord(ch) < 0x20:
+                ch = ' '
+            out.append(ch)
+        else:
+            if ch == '"':
+                in_string = True
+                string_start = len(out)
+            elif ch in '{[':
+                stack.append('}' if ch == '{' else ']')
+            elif ch in '}]' and stack:
+                stack.pop()
+            out.append(ch)
+        i += 1
+
+    fixed = "".join(out)
+    if len(stack) > 1:
+        # Ended inside a nested object or array of the last value
+        cut_value = True
+    elif len(stack) == 1 and in_string:
+        # A string after a colon is a value, otherwise it is the next key
+        cut_value = fixed[:string_start].rstrip().endswith(':')
+    elif len(stack) == 1:
+        # A number or literal at the very end may have lost digits
+        cut_value = bool(re.search(r'[\w.+-]$', fixed.rstrip()))
+    else:
+        cut_value = False
+    if in_string:
+        fixed += '"'
+    elif stack:
+        # A literal cut off mid-word (e.g. 'tr') cannot be parsed; drop it
+        partial = re.search(r'[\w.+-]+$', fixed.rstrip())
+        if partial and not re.fullmatch(r'-?\d+(\.\d+)?([eE][+-]?\d+)?|true|false|null', partial.group()):
+            fixed = fixed.rstrip()[:partial.start()]
+            # At the top level that leaves a dangling key, which is removed below
+            cut_value = cut_value and len(stack) > 1
+    # A truncated response may end in a dangling key, colon or comma
+    fixed = re.sub(r'(,\s*"[^"]*"\s*:?\s*|,\s*|:\s*)$', '', fixed.rstrip())
+    return fixed + "".join(reversed(stack)), cut_value
+
+
+def _repair(text: str):
+    """
+    Return (repaired text, last value cut off) for `repair_json` and
+    `loads_tolerant`.
+    """
+    cleaned = _FENCE_RE.sub("", text or "").strip()
+    start = cleaned.find("{")
+    if start == -1:
+        return cleaned, False
+    end = cleaned.rfind("}")
+    # The span up to the last '}' drops trailing chatter, but only if that
+    # '}' closes the object; a '}' inside a nested value or a string of a
+    # truncated response would cut complete fields off.
+    if end > start:
+        fixed, _ = _scan_and_fix(cleaned[start:end + 1])
+        if _object_closed(cleaned[start:end + 1]):
+            fixed = _TRAILING_COMMA_RE.sub(r"\1", fixed)
+            try:
+                json.loads(fixed)
+                return fixed, False
+            except json.JSONDecodeError:
+                pass
+    # Truncated (or otherwise broken): repair everything after the '{',
+    # closing what is open at the real end of the input
+    fixed, cut_value = _scan_and_fix(cleaned[start:])
+    return _TRAILING_COMMA_RE.sub(r"\1", fixed), cut_value
+
+
+def _object_closed(text: str) -> bool:
+    """
+    True if `text` (starting at '{') ends where that object is closed.
+    """
+    depth = 0
+    in_string = escaped = False
+    for i, ch in enumerate(text):
+        if in_string:
+            if escaped:
+                escaped = False
+            elif ch == '\\':
+                escaped = True
+            elif ch == '"':
+                in_string = False
+        elif ch == '"':
+            in_string = True
+        elif ch in '{[':
+            depth += 1
+        elif ch in '}]':
+            depth -= 1
+            if depth == 0:
+                return i == len(text) - 1
+    return False
+
+
+def repair_json(text: str) -> str:
+    """
+    Best-effort repair of the common ways LLM JSON output breaks:
+    code fences and chatter around the object, trailing commas, unescaped
+    newlines in strings, bad escapes and truncation mid-object.
+    """
+    return _repair(text)[0]
+
+
+def loads_tolerant(text: str) -> dict:
+    """
+    Parse a provider response into a dict, repairing it if necessary.
+    If the response was truncated inside the value of the last field, that
+    field is dropped so the caller can re-request it; complete fields
+    before the truncation point are kept.
+
+    Raises:
+        ValueError: If the text cannot be repaired into a JSON object.
+    """
+    cleaned = _FENCE_RE.sub("", text or "").strip()
+    try:
+        data = json.loads(cleaned)
+        cut_value = False
+    except json.JSONDecodeError:
+        fixed, cut_value = _repair(text)
+        try:
+            data = json.loads(fixed)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Response is not repairable JSON: {e}") from e
+    if not isinstance(data, dict):
+        raise ValueError("Response JSON is not an object.")
+    if cut_value and data:
+        # The value of the last key was cut off; drop it rather than keep a partial field
+        data.pop(next(reversed(data)))
+    return data
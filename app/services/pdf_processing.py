@@ -1,79 +1,310 @@
-from openai import OpenAI
 import os
-import json
 from dotenv import load_dotenv
+import contextvars
 import logging
-import fitz
-import pytesseract
-import io
 import re
-from PIL import Image, ImageOps, ImageFilter, ImageEnhance
+import hashlib
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING
+
+from app.services.admission import memory_budget, estimate_page_bytes
+from app.services.hedging import HedgeCancelled
+from app.services.json_repair import loads_tolerant
+from app.services import rate_limit
+from app.services.rate_limit import estimate_tokens
+
+# PyMuPDF, pytesseract, PIL and the OpenAI SDK are imported on first use, not
+# here: web workers and CLI commands that never OCR or call OpenAI should not
+# pay for them at start-up.
+if TYPE_CHECKING:
+    from PIL import Image
 
 
 # Load the environment variable from .env file
 load_dotenv()
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def _openai_client():
+    """
+    Return the shared OpenAI client, creating it on first use.
+    """
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                from openai import OpenAI
+                _client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+    return _client
+
+
+def _tesseract():
+    """
+    Import and configure pytesseract on first use.
+    """
+    import pytesseract
+    pytesseract.pytesseract.tesseract_cmd = TESSERACT_CMD
+    return pytesseract
+
+# Per-request timeout (seconds) for provider calls, so a hung request cannot block a job forever
+PROVIDER_TIMEOUT = float(os.getenv("PROVIDER_TIMEOUT", 120))
 
 # Explicit Path to tesseract (homebrew)
-pytesseract.pytesseract.tesseract_cmd = "/opt/homebrew/bin/tesseract"
+TESSERACT_CMD = os.getenv("TESSERACT_CMD", "/opt/homebrew/bin/tesseract")
+
+# Resolution of the page images passed to Tesseract
+OCR_DPI = int(os.getenv("OCR_DPI", 400))
+
+# Low-resolution pass used to spot blank pages and look up known pages
+THUMBNAIL_DPI = int(os.getenv("THUMBNAIL_DPI", 50))
+# A page with at most this many dark thumbnail pixels counts as blank (tolerates specks)
+BLANK_PAGE_MAX_INK = int(os.getenv("BLANK_PAGE_MAX_INK", 4))
+
+
+# Automatic OCR language selection (lang="auto")
+LANG_DETECT_DPI = int(os.getenv("LANG_DETECT_DPI", 100))
+DEFAULT_OCR_LANG = os.getenv("DEFAULT_OCR_LANG", "deu")
+
+_STOPWORDS = {
+    "deu": {
+        "der", "die", "das", "und", "ist", "nicht", "mit", "von", "den", "dem", "im", "für",
+        "auf", "des", "ein", "eine", "einer", "zu", "bei", "als", "oder", "nach", "wurde",
+        "werden", "keine", "sich", "links", "rechts", "befund", "untersuchung",
+    },
+    "eng": {
+        "the", "and", "of", "to", "in", "is", "with", "for", "on", "are", "was", "this",
+        "that", "by", "as", "be", "from", "or", "not", "no", "left", "right", "findings",
+    },
+}
+_WORD_RE = re.compile(r"[^\W\d_]+", re.UNICODE)
+
+
+def detect_language(text: str, min_hits: int = 3) -> str | None:
+    """
+    Guess whether a text is German or English from stopword counts
+    (umlauts and ß count towards German).
+
+    Returns:
+        'deu', 'eng', 'deu+eng' for clearly mixed text, or None if there is
+        too little text to decide.
+    """
+    words = [w.lower() for w in _WORD_RE.findall(text or "")]
+    scores = {lang: sum(w in stop for w in words) for lang, stop in _STOPWORDS.items()}
+    scores["deu"] += sum(ch in "äöüßÄÖÜ" for ch in text or "")
+    if max(scores.values()) < min_hits:
+        return None
+    if scores["deu"] >= 2 * scores["eng"]:
+        return "deu"
+    if scores["eng"] >= 2 * scores["deu"]:
+        return "eng"
+    return "deu+eng"
+
+
+def _detect_page_language(page) -> str:
+    """
+    Pick the minimal Tesseract language set for a page.
+
+    Uses the PDF text layer when there is one (free); otherwise runs a single
+    fast low-resolution OCR pass with English only, which still reads German
+    stopwords and umlauts well enough to tell the two apart. Tesseract's OSD
+    is not used since it only detects the script, and both languages are Latin.
+    """
+    import fitz
+    from PIL import Image
+
+    lang = detect_language(page.get_text("text"))
+    if lang:
+        return lang
+    pytesseract = _tesseract()
+    pix = page.get_pixmap(dpi=LANG_DETECT_DPI, colorspace=fitz.csGRAY)
+    img = Image.frombytes("L", (pix.width, pix.height), pix.samples)
+    try:
+        sample = pytesseract.image_to_string(img, lang="eng")
+    except pytesseract.TesseractError as e:
+        logging.warning("Language detection OCR failed: %s", e)
+        sample = ""
+    return detect_language(sample) or DEFAULT_OCR_LANG
+
+
+def _page_thumbnail(page) -> "Image.Image":
+    import fitz
+    from PIL import Image
+
+    pix = page.get_pixmap(dpi=THUMBNAIL_DPI, colorspace=fitz.csGRAY)
+    return Image.frombytes("L", (pix.width, pix.height), pix.samples)
+
+
+def _is_blank(thumb: "Image.Image") -> bool:
+    """
+    A page is blank if its thumbnail has (almost) no dark pixels. Counting
+    ink rather than measuring contrast keeps sparse pages, e.g. a single
+    line of text, from being mistaken for blank ones.
+    """
+    return sum(thumb.histogram()[:200]) <= BLANK_PAGE_MAX_INK
+
 
+def _page_hash(thumb: "Image.Image") -> str:
+    """
+    Key of a page thumbnail: a digest of the binarised thumbnail, so only
+    pages that render identically share cached text. Deliberately exact
+    rather than perceptual: pages that differ only in small print (e.g. a
+    single measured value) must not be matched.
+    """
+    return hashlib.sha256(thumb.point(lambda v: 255 if v > 160 else 0).tobytes()).hexdigest()
+
+
+def _file_sha256(path: str, chunk_size: int = 1024 * 1024) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _render_for_ocr(page) -> "Image.Image":
+    """
+    Render a page at OCR resolution and preprocess it.
+
+    The page is rasterised straight to 8-bit grayscale and wrapped without a
+    PNG round-trip, and each intermediate image is released as soon as the
+    next one exists, so at most two page-sized buffers are alive at a time.
+    """
+    import fitz
+    from PIL import Image, ImageEnhance, ImageFilter
 
-def extract_pdf_content(pdf_blob: bytes, lang: str = "deu") -> dict:
+    pix = page.get_pixmap(dpi=OCR_DPI, colorspace=fitz.csGRAY)
+    img = Image.frombytes("L", (pix.width, pix.height), pix.samples)
+    del pix
+    sharpened = img.filter(ImageFilter.SHARPEN)
+    img.close()
+    enhanced = ImageEnhance.Contrast(sharpened).enhance(2.0)
+    sharpened.close()
+    return enhanced
+
+
+def _extract_page(page, page_index, lang, page_cache, doc_key, seen_lines_global) -> dict:
+    """
+    OCR a single page for `extract_pdf_content` and return its page entry.
+    Lines already seen on earlier pages are dropped (via `seen_lines_global`).
+    """
+    thumb = _page_thumbnail(page)
+    if _is_blank(thumb):
+        return {"page": page_index + 1, "text": "", "language": None, "blank": True, "cached": False}
+
+    page_hash = ocr_text = None
+    if page_cache is not None:
+        page_hash = _page_hash(thumb)
+        try:
+            ocr_text = page_cache.lookup(page_hash)
+        except Exception:
+            logging.exception("Page cache lookup failed on page %d", page_index + 1)
+    cached = ocr_text is not None
+
+    if cached:
+        page_lang = (detect_language(ocr_text) or DEFAULT_OCR_LANG) if lang == "auto" else lang
+    else:
+        page_lang = _detect_page_language(page) if lang == "auto" else lang
+        pytesseract = _tesseract()
+        # Wait until the full-resolution render fits into the process's memory budget
+        with memory_budget.reserve(estimate_page_bytes(page.rect.width, page.rect.height, OCR_DPI)):
+            img = _render_for_ocr(page)
+            try:
+                ocr_text = pytesseract.image_to_string(img, lang=page_lang)
+                if page_hash is not None:
+                    try:
+                        page_cache.record(page_hash, ocr_text, doc_key)
+                    except Exception:
+                        logging.exception("Page cache update failed on page %d", page_index + 1)
+            except pytesseract.TesseractError as e:
+                logging.error(f"Tesseract OCR failed on page {page_index + 1}: {e}")
+                ocr_text = ""
+            finally:
+                img.close()
+
+    # Clean and deduplicate lines
+    lines = []
+    for line in ocr_text.splitlines():
+        line = line.strip()
+        if not line or re.fullmatch(r"[_\-\s]+", line):
+            continue
+        normalized = re.sub(r"\s+", " ", line)
+        if normalized not in seen_lines_global:
+            seen_lines_global.add(normalized)
+            lines.append(normalized)
+
+    page_text = "\n".join(lines)
+    return {
+        "page": page_index + 1,
+        "text": page_text,
+        "language": page_lang,
+        "blank": False,
+        "cached": cached
+    }
+
+
+def extract_pdf_content(pdf_source, lang: str = "deu", page_cache=None, doc_key: str = None) -> dict:
     """
     Perform enhanced OCR on all pages of a PDF to extract textual content.
     Applies grayscale, sharpening, contrast enhancement, and deduplication.
 
+    Every page is first rendered as a cheap low-resolution thumbnail: blank
+    pages are skipped, and pages whose thumbnail hash is known to the
+    `page_cache` (recurring vendor boilerplate) reuse the cached text instead
+    of being rendered at 400 DPI and OCR'd.
+
+    A path is preferred over bytes: MuPDF then reads the document from disk
+    page by page instead of from a copy of the whole file in memory.
+
     Args:
-        pdf_blob (bytes): The binary content of the PDF file.
-        lang (str): Language(s) for Tesseract OCR, e.g. 'deu', 'eng'.
+        pdf_source (str | bytes): Path to the PDF file, or its binary content.
+        lang (str): Language(s) for Tesseract OCR, e.g. 'deu', 'eng', or 'auto'
+            to detect the minimal language set per page.
+        page_cache: Optional object with `lookup(page_hash)` and
+            `record(page_hash, text, doc_key)`, e.g. PageCacheManager.
+        doc_key (str): Identifies the document to the page cache; defaults to
+            the SHA-256 of the PDF.
 
     Returns:
         dict: {
             'raw_text': str (all pages concatenated),
-            'pages': list of dicts [{page: int, text: str}],
-            'language': str (lang used),
+            'pages': list of dicts [{page: int, text: str, language: str|None,
+                                     blank: bool, cached: bool}],
+            'language': str (lang used, for 'auto' the languages detected, e.g. 'deu+eng'),
         }
     """
+    import fitz
+
     text_pages = []
     seen_lines_global = set()
+    if isinstance(pdf_source, str):
+        if page_cache is not None and doc_key is None:
+            doc_key = _file_sha256(pdf_source)
+        pdf_document = fitz.open(pdf_source, filetype="pdf")
+    else:
+        if page_cache is not None and doc_key is None:
+            doc_key = hashlib.sha256(pdf_source).hexdigest()
+        pdf_document = fitz.open(stream=pdf_source, filetype="pdf")
 
-    pdf_document = fitz.open(stream=pdf_blob, filetype="pdf")
-
-    for page_index in range(len(pdf_document)):
-        page = pdf_document.load_page(page_index)
-        pix = page.get_pixmap(dpi=400)
-        img = Image.open(io.BytesIO(pix.tobytes("png")))
-
-        # Preprocessing
-        img = ImageOps.grayscale(img)
-        img = img.filter(ImageFilter.SHARPEN)
-        img = ImageEnhance.Contrast(img).enhance(2.0)
-
-        try:
-            ocr_text = pytesseract.image_to_string(img, lang=lang)
-        except pytesseract.TesseractError as e:
-            logging.error(f"Tesseract OCR failed on page {page_index + 1}: {e}")
-            ocr_text = ""
-
-        # Clean and deduplicate lines
-        lines = []
-        for line in ocr_text.splitlines():
-            line = line.strip()
-            if not line or re.fullmatch(r"[_\-\s]+", line):
-                continue
-            normalized = re.sub(r"\s+", " ", line)
-            if normalized not in seen_lines_global:
-                seen_lines_global.add(normalized)
-                lines.append(normalized)
-
-        page_text = "\n".join(lines)
-        text_pages.append({
-            "page": page_index + 1,
-            "text": page_text
-        })
+    try:
+        for page_index in range(len(pdf_document)):
+            page = pdf_document.load_page(page_index)
+            text_pages.append(_extract_page(page, page_index, lang, page_cache, doc_key, seen_lines_global))
+            # Drop MuPDF's cached page resources (fonts, images) before the next page
+            del page
+            fitz.TOOLS.store_shrink(100)
+    finally:
+        pdf_document.close()
 
     full_text = "\n\n".join([f"--- Page {p['page']} ---\n{p['text']}" for p in text_pages if p['text']]).strip()
 
+    if lang == "auto":
+        detected = {part for p in text_pages if p["language"] for part in p["language"].split("+")}
+        lang = "+".join(sorted(detected)) or DEFAULT_OCR_LANG
+
     return {
         "raw_text": full_text,
         "pages": text_pages,
@@ -81,20 +312,9 @@ def extract_pdf_content(pdf_blob: bytes, lang: str = "deu") -> dict:
     }
 
 
-def build_prompt(structured_data: dict) -> str:
-    """
-    Build a structured OpenAI prompt from extracted OCR text,
-    requesting a strictly formatted JSON response with content in both English and German.
-    """
-    # Ensure we safely extract the raw text string
-    extracted_text = structured_data.get("raw_text", "")
-    if not isinstance(extracted_text, str):
-        extracted_text = str(extracted_text)
-
-    # Normalize whitespace
-    extracted_text = extracted_text.strip()
-
-    return (
+# Static instructions every prompt starts with; the extracted text follows.
+# Kept separate so the local model can reuse its KV cache across documents.
+PROMPT_PREAMBLE = (
     "You are a radiologist and language model assistant. Your task is to generate structured report content "
     "based solely on the extracted text from a PDF file. This PDF contains output from an AI-based medical image analysis system, "
     "which has processed DICOM data and presented findings in both text and tables. The source text may be in English or German.\n\n"
@@ -119,7 +339,17 @@ def build_prompt(structured_data: dict) -> str:
     "  \"long_text_en\": \"string\",            // Layperson-friendly version of the above, in ENGLISH.\n"
     "  \"short_text_de\": \"string\",           // RSNA-style summary for radiology report integration, in GERMAN (Befund-Stil).\n"
     "  \"long_text_de\": \"string\",            // Layperson-friendly version of the above, in GERMAN (laienfreundliche Sprache).\n"
-    "  \"quality\": \"string\"                  // e.g. 'Good', 'Insufficient resolution', or comments from quality control\n"
+    "  \"quality\": \"string\",                 // e.g. 'Good', 'Insufficient resolution', or comments from quality control\n"
+    "  \"findings\": [                          // one entry per quantitative result or lesion reported in the PDF\n"
+    "    {\n"
+    "      \"type\": \"string\",                  // e.g. 'volume', 'lesion_count', 'SUVmax'\n"
+    "      \"location\": \"string\",              // e.g. 'Hippocampus left'\n"
+    "      \"value\": \"string\",                 // value exactly as reported, e.g. '3.42'\n"
+    "      \"unit\": \"string\",                  // e.g. 'ml', 'mm', 'count'\n"
+    "      \"percentile\": \"string\",            // normative percentile if reported, else omit\n"
+    "      \"significance\": \"string\"           // e.g. 'below normal range', 'new lesion'\n"
+    "    }\n"
+    "  ]\n"
     "}\n"
     "```\n\n"
 
@@ -129,32 +359,303 @@ def build_prompt(structured_data: dict) -> str:
     "- In the `short_text_en`, write a concise, professional summary in English suitable for a radiology report. Include company, method, and key findings.\n"
     "- In the `long_text_en`, explain the same findings in accessible English terms for patients.\n"
     "- In the `short_text_de`, write a concise, professional summary in German suitable for a radiology report (im Stil eines ärztlichen Befundes).\n"
-    "- In the `long_text_de`, explain the same findings in accessible German terms for patients (in einer für Laien verständlichen Sprache).\n\n"
+    "- In the `long_text_de`, explain the same findings in accessible German terms for patients (in einer für Laien verständlichen Sprache).\n"
+    "- In `findings`, list every measured value or lesion from the tables as a separate entry. Copy numbers verbatim; do not compute new values.\n\n"
 
     "Begin your analysis using the following extracted text:\n\n"
-    f"\"{extracted_text}\""
 )
 
 
-def call_openai(prompt):
-    response = client.chat.completions.create(
-        model="gpt-4o-mini",
-        messages=[{"role": "user", "content": prompt}],
-        temperature=0.2
+def build_prompt(structured_data: dict) -> str:
+    """
+    Build a structured OpenAI prompt from extracted OCR text,
+    requesting a strictly formatted JSON response with content in both English and German.
+    The prompt is PROMPT_PREAMBLE followed by the quoted text.
+    """
+    # Ensure we safely extract the raw text string
+    extracted_text = structured_data.get("raw_text", "")
+    if not isinstance(extracted_text, str):
+        extracted_text = str(extracted_text)
+
+    # Normalize whitespace
+    extracted_text = extracted_text.strip()
+
+    return PROMPT_PREAMBLE + f"\"{extracted_text}\""
+
+
+# -----------------------------------------------------------------------------
+# Structured output schema for the report JSON
+# -----------------------------------------------------------------------------
+_STR = {"type": ["string", "null"]}
+
+FINDING_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "type": {"type": "string"},
+        "location": _STR,
+        "value": _STR,
+        "unit": _STR,
+        "percentile": _STR,
+        "significance": _STR,
+    },
+    "required": ["type", "location", "value", "unit", "percentile", "significance"],
+    "additionalProperties": False,
+}
+
+REPORT_FIELDS = {
+    "company": _STR,
+    "sequences": {"type": "array", "items": {"type": "string"}},
+    "method": _STR,
+    "region": _STR,
+    "modality": _STR,
+    "short_text_en": {"type": "string"},
+    "long_text_en": {"type": "string"},
+    "short_text_de": {"type": "string"},
+    "long_text_de": {"type": "string"},
+    "quality": _STR,
+    "findings": {"type": "array", "items": FINDING_SCHEMA},
+}
+
+# Fields a report cannot do without; anything else may legitimately be empty
+REQUIRED_REPORT_FIELDS = ("short_text_en", "long_text_en", "short_text_de", "long_text_de")
+
+# How many follow-up requests may be spent on fields that came back broken
+FIELD_RETRIES = int(os.getenv("FIELD_RETRIES", 1))
+
+# Fan-out mode: request the report as several smaller concurrent requests
+# instead of one long answer, so the output tokens of the parts are generated
+# in parallel. Every part repeats the full prompt (a shared prefix the
+# providers can cache) and asks only for its own fields.
+REPORT_FAN_OUT = os.getenv("REPORT_FAN_OUT", "false").lower() in ("1", "true", "yes")
+FAN_OUT_GROUPS = {
+    "summary": ("company", "sequences", "method", "region", "modality", "quality", "short_text_en", "short_text_de"),
+    "long_en": ("long_text_en",),
+    "long_de": ("long_text_de",),
+    "findings": ("findings",),
+}
+_fan_out_executor = ThreadPoolExecutor(max_workers=int(os.getenv("FAN_OUT_WORKERS", 8)), thread_name_prefix="fanout")
+
+
+def report_schema(fields=None) -> dict:
+    """
+    JSON schema (OpenAI strict mode) for the report or a subset of its fields.
+    """
+    fields = list(fields or REPORT_FIELDS)
+    return {
+        "type": "object",
+        "properties": {f: REPORT_FIELDS[f] for f in fields},
+        "required": fields,
+        "additionalProperties": False,
+    }
+
+
+def _gemini_schema(schema: dict) -> dict:
+    """
+    Convert a JSON schema to the OpenAPI subset Gemini accepts:
+    nullable instead of type lists, no additionalProperties.
+    """
+    converted = {}
+    for key, value in schema.items():
+        if key == "additionalProperties":
+            continue
+        if key == "type" and isinstance(value, list):
+            converted["type"] = next(t for t in value if t != "null")
+            converted["nullable"] = "null" in value
+        elif key == "properties":
+            converted[key] = {k: _gemini_schema(v) for k, v in value.items()}
+        elif key == "items":
+            converted[key] = _gemini_schema(value)
+        else:
+            converted[key] = value
+    return converted
+
+
+def _matches_schema(value, schema: dict) -> bool:
+    """
+    Check `value` against the types of a REPORT_FIELDS schema: strings,
+    nullable strings, arrays and objects (only the properties present are
+    checked).
+    """
+    types = schema["type"] if isinstance(schema["type"], list) else [schema["type"]]
+    if value is None:
+        return "null" in types
+    if "array" in types:
+        return isinstance(value, list) and all(_matches_schema(item, schema["items"]) for item in value)
+    if "object" in types:
+        return isinstance(value, dict) and all(
+            _matches_schema(value[k], prop) for k, prop in schema["properties"].items() if k in value
+        )
+    return isinstance(value, str)
+
+
+def _invalid_fields(data: dict, fields) -> list:
+    """
+    Return the fields whose value does not match their REPORT_FIELDS type,
+    plus the required fields that are missing or empty. Optional fields may
+    be left out.
+    """
+    invalid = []
+    for f in fields:
+        if f in REQUIRED_REPORT_FIELDS:
+            if not (isinstance(data.get(f), str) and data[f].strip()):
+                invalid.append(f)
+        elif f in data and not _matches_schema(data[f], REPORT_FIELDS[f]):
+            invalid.append(f)
+    return invalid
+
+
+def _retry_prompt(prompt: str, fields) -> str:
+    return (
+        f"{prompt}\n\n"
+        "**Follow-up:** Your previous answer was incomplete or malformed. "
+        "Return ONLY a JSON object with the following keys, following the same instructions: "
+        + ", ".join(fields) + "."
+    )
+
+
+def _fan_out_prompt(prompt: str, fields) -> str:
+    return (
+        f"{prompt}\n\n"
+        "**Scope of this request:** The report is assembled from several requests that share the instructions above. "
+        "Return ONLY a JSON object with the following keys, following the same instructions: "
+        + ", ".join(fields) + "."
     )
-    content = response.choices[0].message.content
 
-    try:
-        # Remove ```json and ``` if present
-        cleaned = re.sub(r"```json|```", "", content).strip()
-        data = json.loads(cleaned)
+
+def _timed_request(request_json, text: str, fields):
+    start = time.monotonic()
+    return request_json(text, fields), time.monotonic() - start
+
+
+def _request_fan_out(request_json, prompt: str, provider: str):
+    """
+    Request the FAN_OUT_GROUPS concurrently and merge their fields.
+
+    Returns:
+        tuple: (merged fields, fields of the parts that returned unusable
+        JSON, for the caller to re-request). Other errors are raised once
+        every part has finished.
+    """
+    start = time.monotonic()
+    futures = {
+        name: _fan_out_executor.submit(
+            # copy the caller's context, e.g. its rate-limit priority
+            contextvars.copy_context().run, _timed_request, request_json, _fan_out_prompt(prompt, fields), list(fields)
+        )
+        for name, fields in FAN_OUT_GROUPS.items()
+    }
+
+    data, failed, timings, error = {}, [], {}, None
+    for name, future in futures.items():
+        try:
+            part, timings[name] = future.result()
+        except ValueError as e:
+            logging.warning("%s fan-out part %s returned unusable JSON: %s", provider, name, e)
+            failed.extend(FAN_OUT_GROUPS[name])
+            continue
+        except Exception as e:
+            error = error or e
+            continue
+        data.update({f: part[f] for f in FAN_OUT_GROUPS[name] if f in part})
+    if error:
+        raise error
+
+    logging.info(
+        "%s fan-out finished in %.1fs (%s)", provider, time.monotonic() - start,
+        ", ".join(f"{name} {seconds:.1f}s" for name, seconds in timings.items()),
+    )
+    return data, failed
+
+
+def _cancellable(request_json, provider: str, cancel):
+    """
+    Wrap `request_json` so no further request is sent, and no answer is
+    used, once `cancel` is set.
+    """
+    if cancel is None:
+        return request_json
+
+    def request(text, fields):
+        if cancel.is_set():
+            raise HedgeCancelled(f"{provider} request cancelled.")
+        data = request_json(text, fields)
+        if cancel.is_set():
+            raise HedgeCancelled(f"{provider} request cancelled.")
         return data
-    except json.JSONDecodeError as e:
-        print("JSONDecodeError:", str(e))
-        raise ValueError("OpenAI did not return valid JSON. Prompt might need refinement.")
 
+    return request
+
+
+def _complete_report(request_json, prompt: str, provider: str, fan_out: bool | None = None, cancel=None) -> dict:
+    """
+    Request the report and re-request only the fields that came back missing
+    or malformed, merging them into the first answer.
 
-def call_gemini(prompt):
+    Args:
+        request_json (callable): (prompt, fields) -> dict; performs one provider call.
+        prompt (str): The report prompt.
+        provider (str): Provider name for error messages.
+        fan_out (bool): Request the report in concurrent parts (see
+            FAN_OUT_GROUPS); defaults to REPORT_FAN_OUT.
+        cancel (threading.Event): Once set, no retry or follow-up request is
+            made and HedgeCancelled is raised instead.
+    """
+    if fan_out is None:
+        fan_out = REPORT_FAN_OUT
+    request_json = _cancellable(request_json, provider, cancel)
+    if fan_out:
+        data, failed = _request_fan_out(request_json, prompt, provider)
+    else:
+        try:
+            data = request_json(prompt, None)
+        except ValueError as e:
+            logging.warning("%s returned unusable JSON, retrying: %s", provider, e)
+            data = {}
+        failed = [] if data else list(REPORT_FIELDS)
+
+    # Fields of unusable answers, optional ones included, plus fields of the wrong type
+    missing = failed + [f for f in _invalid_fields(data, REPORT_FIELDS) if f not in failed]
+    for _ in range(FIELD_RETRIES):
+        if not missing:
+            break
+        logging.info("Re-requesting %s fields from %s", missing, provider)
+        try:
+            data.update(request_json(_retry_prompt(prompt, missing), missing))
+        except ValueError as e:
+            logging.warning("%s field retry failed: %s", provider, e)
+        missing = _invalid_fields(data, missing)
+
+    failed = _invalid_fields(data, REQUIRED_REPORT_FIELDS)
+    if failed:
+        raise ValueError(f"{provider} did not return valid JSON for: {', '.join(failed)}")
+    # Optional fields still of the wrong type are dropped rather than stored
+    for f in missing:
+        if data.pop(f, None) is not None:
+            logging.warning("Dropping malformed %s field from %s", f, provider)
+    return data
+
+
+def call_openai(prompt, cancel=None):
+    def request_json(text, fields):
+        with rate_limit.limit("openai", estimate_tokens(text)) as slot:
+            response = _openai_client().chat.completions.create(
+                model="gpt-4o-mini",
+                messages=[{"role": "user", "content": text}],
+                temperature=0.2,
+                timeout=PROVIDER_TIMEOUT,
+                response_format={
+                    "type": "json_schema",
+                    "json_schema": {"name": "radiology_report", "strict": True, "schema": report_schema(fields)},
+                },
+            )
+            if response.usage:
+                slot.actual_tokens = response.usage.total_tokens
+        return loads_tolerant(response.choices[0].message.content)
+
+    return _complete_report(request_json, prompt, "OpenAI", cancel=cancel)
+
+
+def call_gemini(prompt, cancel=None):
     import google.generativeai as genai
 
     # Configure the client with your API key
@@ -165,23 +666,42 @@ def call_gemini(prompt):
     genai.configure(api_key=api_key)
     model = genai.GenerativeModel("gemini-2.0-flash-exp")
 
-    # Generate a response using the Gemini API
-    response = model.generate_content(prompt)
-    text = response.text
-
-    # 2) Strip ```json and ``` if present
-    cleaned = re.sub(r"```json|```", "", text).strip()
-
-    # 3) Parse to dict
-    try:
-        data = json.loads(cleaned)
-        return data
-    except json.JSONDecodeError as e:
-        # Optionally log raw text and the exception
-        print("Gemini raw response:", repr(text))
-        print("Cleaned for JSON:", repr(cleaned))
-        raise ValueError("Gemini did not return valid JSON.") from e
-
+    def request_json(text, fields):
+        with rate_limit.limit("gemini", estimate_tokens(text)) as slot:
+            response = model.generate_content(
+                text,
+                generation_config={
+                    "response_mime_type": "application/json",
+                    "response_schema": _gemini_schema(report_schema(fields)),
+                },
+                request_options={"timeout": PROVIDER_TIMEOUT},
+            )
+            usage = getattr(response, "usage_metadata", None)
+            if usage:
+                slot.actual_tokens = usage.total_token_count
+        return loads_tolerant(response.text)
+
+    return _complete_report(request_json, prompt, "Gemini", cancel=cancel)
+
+
+def call_qwen_json(prompt, cancel=None):
+    """
+    Run the prompt on the local Qwen model and parse its answer like the
+    remote providers. The model is only loaded on first use; setting
+    `cancel` also stops a running generation.
+    """
+    from app.services.qwen_processing import call_qwen
 
+    # Never fanned out: parallel parts would only compete for the same local CPU
+    return _complete_report(
+        lambda text, fields: loads_tolerant(call_qwen(text, cancel=cancel)), prompt, "Qwen",
+        fan_out=False, cancel=cancel
+    )
 
 
+# Provider name -> callable(prompt, cancel=None) -> dict, used for hedged requests
+PROVIDERS = {
+    "openai": call_openai,
+    "gemini": call_gemini,
+    "qwen": call_qwen_json,
+}
@@ -0,0 +1,334 @@
+import contextvars
+import hashlib
+import inspect
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+from flask import current_app
+
+from app.services import pdf_processing
+from app.services.hedging import hedged_call
+from app.services.pdf_processing import extract_pdf_content, build_prompt, PROVIDERS
+from app.services.rate_limit import request_priority
+from utils.helpers import generate_unique_id
+
+
+# Stages in execution order
+STAGES = ("extract", "prompt", "openai", "gemini")
+PROVIDER_STAGES = ("openai", "gemini")
+# The stages whose output each stage consumes; the providers are independent of each other
+STAGE_INPUTS = {"extract": (), "prompt": ("extract",), "openai": ("prompt",), "gemini": ("prompt",)}
+
+# Report columns filled from each provider stage
+PROVIDER_COLUMNS = {
+    stage: (
+        f"report_section_short_{stage}", f"report_section_long_{stage}",
+        f"report_section_short_{stage}_de", f"report_section_long_{stage}_de",
+    )
+    for stage in PROVIDER_STAGES
+}
+
+# Deferred provider stages are generated after processing, one PDF at a time
+# per worker, and retried at most every SECONDARY_RETRY_AFTER seconds
+SECONDARY_RETRY_AFTER = float(os.getenv("SECONDARY_RETRY_AFTER", 300))
+_secondary_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv("SECONDARY_WORKERS", 2)), thread_name_prefix="secondary"
+)
+_secondary_lock = threading.Lock()
+_secondary_inflight = set()
+_secondary_failed = {}  # pdf_id -> time.monotonic() of the last failure
+
+
+def _fingerprint(*parts) -> str:
+    """
+    Hash the source code of functions and the repr of config values, so any
+    edit to a stage's code or settings yields a new version.
+    """
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update((inspect.getsource(part) if callable(part) else repr(part)).encode("utf-8"))
+    return digest.hexdigest()[:16]
+
+
+def stage_versions() -> dict:
+    """
+    Return {stage: version}. A stage's version covers its own code and
+    configuration plus the versions of the stages it depends on, so changing
+    e.g. `build_prompt` also invalidates both provider stages.
+    """
+    pp = pdf_processing
+    extract = _fingerprint(
+        pp.extract_pdf_content, pp._extract_page, pp._render_for_ocr, pp._page_thumbnail,
+        pp._is_blank, pp._page_hash, pp._detect_page_language, pp.detect_language,
+        pp.OCR_DPI, pp.THUMBNAIL_DPI, pp.BLANK_PAGE_MAX_INK, pp.LANG_DETECT_DPI, pp.DEFAULT_OCR_LANG,
+    )
+    prompt = _fingerprint(pp.build_prompt, pp.PROMPT_PREAMBLE, extract)
+    provider_common = (pp._complete_report, pp.report_schema, pp.REPORT_FIELDS, pp.REQUIRED_REPORT_FIELDS)
+    return {
+        "extract": extract,
+        "prompt": prompt,
+        "openai": _fingerprint(pp.call_openai, *provider_common, prompt),
+        "gemini": _fingerprint(pp.call_gemini, *provider_common, prompt),
+    }
+
+
+def dependent_stages(stage: str) -> tuple:
+    """
+    Return `stage` and every stage that consumes its output, directly or
+    indirectly, in execution order.
+    """
+    found = {stage}
+    for later in STAGES:
+        if any(upstream in found for upstream in STAGE_INPUTS[later]):
+            found.add(later)
+    return tuple(s for s in STAGES if s in found)
+
+
+def deferred_stages(config) -> tuple:
+    """
+    Provider stages left out of `process_document` and generated on demand
+    (SECONDARY_PROVIDER_MODE 'background' or 'on_view'): every provider
+    except PRIMARY_PROVIDER. Empty in 'eager' mode.
+    """
+    if config.get('SECONDARY_PROVIDER_MODE', 'eager') == 'eager':
+        return ()
+    return tuple(stage for stage in PROVIDER_STAGES if stage != config['PRIMARY_PROVIDER'])
+
+
+def stale_stages(pdf_id: str, data_manager, versions: dict | None = None, deferred=()) -> list:
+    """
+    Return the stages whose current version has no stored artifact for the
+    PDF. A `deferred` stage that was never generated is not stale, only one
+    stored under an outdated version.
+    """
+    versions = versions or stage_versions()
+    stored = data_manager.artifact_manager.get_versions(pdf_id)
+    return [
+        stage for stage in STAGES
+        if versions[stage] not in stored.get(stage, ()) and (stage not in deferred or stored.get(stage))
+    ]
+
+
+def store_artifact(pdf_id: str, stage: str, content, data_manager, versions: dict | None = None):
+    """
+    Store a stage output under the stage's current version and drop older
+    versions. Also used for outputs computed outside `process_document`,
+    e.g. OCR run in a worker process by the backfill command.
+    """
+    versions = versions or stage_versions()
+    artifacts = data_manager.artifact_manager
+    artifacts.save_artifact(pdf_id, stage, versions[stage], content)
+    artifacts.prune(pdf_id, stage, versions[stage])
+
+
+def process_document(entry, data_manager, force=(), hedging=None, lang="auto", providers=None) -> str:
+    """
+    Run the processing pipeline for an uploaded PDF, reusing every stage
+    artifact whose version is still current and recomputing the rest.
+
+    Args:
+        entry (ImageAnalysisPDF): The uploaded PDF.
+        data_manager (DataManagerInterface): Access to all table managers.
+        force (iterable[str]): Stages to recompute even if their artifact is current.
+        hedging (bool): Race providers (see hedging.py) when no provider
+            output exists yet; defaults to the PROVIDER_HEDGING setting.
+        lang (str): OCR language passed to `extract_pdf_content`.
+        providers (iterable[str]): Provider stages to compute if missing;
+            defaults to all but the `deferred_stages` (forced stages are
+            always computed).
+
+    Returns:
+        str: ID of the created or updated processed report.
+    """
+    versions = stage_versions()
+    force = set(force)
+    artifacts = data_manager.artifact_manager
+    stored = artifacts.get_versions(entry.id)
+    config = current_app.config
+    if hedging is None:
+        hedging = config.get('PROVIDER_HEDGING', False)
+    if providers is None:
+        deferred = deferred_stages(config)
+        providers = [stage for stage in PROVIDER_STAGES if stage not in deferred or stage in force]
+
+    def cached(stage):
+        if stage in force or versions[stage] not in stored.get(stage, ()):
+            return None
+        return artifacts.get_artifact(entry.id, stage, versions[stage])
+
+    def save(stage, content):
+        store_artifact(entry.id, stage, content, data_manager, versions)
+
+    extracted = cached("extract")
+    if extracted is None:
+        # Let MuPDF read the PDF from a spooled file rather than an in-memory copy
+        pdf_path = data_manager.pdf_manager.spool_pdf(entry.id)
+        try:
+            extracted = extract_pdf_content(
+                pdf_path, lang=lang, page_cache=data_manager.page_cache_manager,
+                doc_key=entry.content_sha256
+            )
+        finally:
+            os.remove(pdf_path)
+        if not extracted.get('raw_text'):
+            raise ValueError("No usable text extracted.")
+        save("extract", extracted)
+
+    prompt = cached("prompt")
+    if prompt is None:
+        prompt = build_prompt(extracted)
+        save("prompt", prompt)
+
+    outputs = {stage: cached(stage) for stage in PROVIDER_STAGES}
+    missing = [stage for stage in providers if outputs[stage] is None]
+
+    sources = {}
+    if hedging and missing and not any(outputs.values()):
+        # Race the primary provider against the fallbacks; only the winner's
+        # texts are stored (a local Qwen answer stands in for the primary).
+        primary = config['HEDGE_PRIMARY']
+        winner, result = hedged_call(
+            prompt,
+            (primary, PROVIDERS[primary]),
+            [(name, PROVIDERS[name]) for name in config['HEDGE_FALLBACKS']],
+            validate=lambda r: isinstance(r, dict) and bool(r.get('short_text_en')),
+        )
+        if winner in PROVIDER_STAGES:
+            outputs[winner] = result
+            save(winner, result)
+        else:
+            # Shown in the primary's place but labelled as the stand-in, and
+            # stored under a version of its own: the primary stage stays stale
+            # and is generated by the next run or `reprocess`
+            outputs[primary] = result
+            sources[primary] = winner
+            store_artifact(entry.id, primary, result, data_manager, {primary: f"{versions[primary]}+{winner}"})
+    else:
+        for stage in missing:
+            outputs[stage] = PROVIDERS[stage](prompt)
+            save(stage, outputs[stage])
+
+    return _store_report(entry, outputs, data_manager, sources)
+
+
+def missing_sections(report, stages) -> list:
+    """
+    Return the provider stages among `stages` whose report columns are all
+    empty, i.e. that have not been generated for this report yet. `report`
+    may also be its cache info with these columns as flags (see
+    get_report_cache_info).
+    """
+    return [stage for stage in stages if not any(getattr(report, c) for c in PROVIDER_COLUMNS[stage])]
+
+
+def _secondary_state(pdf_id: str) -> str:
+    """
+    'pending' while deferred stages are being generated for the PDF,
+    'failed' if the last attempt failed recently, else 'idle'.
+    The caller holds _secondary_lock.
+    """
+    if pdf_id in _secondary_inflight:
+        return 'pending'
+    failed_at = _secondary_failed.get(pdf_id)
+    if failed_at is not None and time.monotonic() - failed_at < SECONDARY_RETRY_AFTER:
+        return 'failed'
+    return 'idle'
+
+
+def request_secondary(app, data_manager, pdf_id: str, priority=None) -> str:
+    """
+    Generate the deferred provider stages of a PDF in a background thread,
+    unless that is already running or failed recently, and return the
+    resulting state ('pending' or 'failed'). The primary's outputs and the stored prompt
+    are reused; storing the new sections bumps the report's updated_at (and
+    thereby its ETag).
+    """
+    with _secondary_lock:
+        state = _secondary_state(pdf_id)
+        if state != 'idle':
+            return state
+        _secondary_inflight.add(pdf_id)
+    # Run in a copy of the caller's context: setting the priority there does
+    # not leak into later tasks of the reused executor thread
+    _secondary_executor.submit(contextvars.copy_context().run, _generate_secondary, app, data_manager, pdf_id, priority)
+    return 'pending'
+
+
+def _generate_secondary(app, data_manager, pdf_id: str, priority):
+    if priority is not None:
+        request_priority.set(priority)
+    try:
+        with app.app_context():
+            entry = data_manager.pdf_manager.get_pdf(pdf_id)
+            process_document(entry, data_manager, hedging=False, providers=PROVIDER_STAGES)
+        with _secondary_lock:
+            _secondary_failed.pop(pdf_id, None)
+    except Exception:
+        logging.exception("Generating deferred provider sections failed for PDF %s", pdf_id)
+        with _secondary_lock:
+            _secondary_failed[pdf_id] = time.monotonic()
+    finally:
+        with _secondary_lock:
+            _secondary_inflight.discard(pdf_id)
+
+
+def _store_report(entry, outputs: dict, data_manager, sources=None) -> str:
+    """
+    Write provider outputs into the PDF's processed report, creating it on
+    first run and updating it in place on reprocessing. `sources` names the
+    stand-in that produced a stage's output, if not the stage's provider.
+    """
+    oa = outputs.get("openai") or {}
+    gm = outputs.get("gemini") or {}
+    meta = oa or gm
+
+    seqs = meta.get('sequences', [])
+    seqs = ", ".join(seqs) if isinstance(seqs, list) else seqs
+
+    fields = dict(
+        company_name=meta.get('company'),
+        sequences=seqs,
+        method_used=meta.get('method'),
+        body_region=meta.get('region'),
+        modality=meta.get('modality'),
+
+        # English Reports from API
+        report_section_short_openai=oa.get('short_text_en'),
+        report_section_long_openai=oa.get('long_text_en'),
+        report_section_short_gemini=gm.get('short_text_en'),
+        report_section_long_gemini=gm.get('long_text_en'),
+
+        # German Reports from API
+        report_section_short_openai_de=oa.get('short_text_de'),
+        report_section_long_openai_de=oa.get('long_text_de'),
+        report_section_short_gemini_de=gm.get('short_text_de'),
+        report_section_long_gemini_de=gm.get('long_text_de'),
+
+        report_quality_score=meta.get('quality'),
+        section_sources=json.dumps(sources) if sources else None,
+    )
+
+    existing = data_manager.processed_manager.get_by_pdf_id(entry.id)
+    if existing:
+        proc_id = existing.id
+        data_manager.processed_manager.update_processed_data(proc_id, **fields)
+    else:
+        proc_id = generate_unique_id()
+        data_manager.processed_manager.add_processed_data(
+            id=proc_id,
+            pdf_data_id=entry.id,
+            created_at=datetime.now(timezone.utc),
+            **fields
+        )
+
+    findings = meta.get('findings')
+    if isinstance(findings, list):
+        data_manager.finding_manager.replace_findings(proc_id, findings)
+
+    logging.info("Stored report %s for PDF %s", proc_id, entry.id)
+    return proc_id
@@ -0,0 +1,229 @@
+import contextvars
+import logging
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+# Overridden by RATE_LIMIT_DB, read when the limiter is first used
+DEFAULT_RATE_LIMIT_DB = os.path.join(BASE_DIR, "data", "rate_limits.db")
+RATE_LIMIT_MAX_WAIT = float(os.getenv("RATE_LIMIT_MAX_WAIT", 300))
+
+# Lower value = served first. Interactive uploads preempt queued batch work.
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BATCH = 10
+
+# Priority of provider calls made from the current context (request, thread, task)
+request_priority = contextvars.ContextVar("request_priority", default=PRIORITY_INTERACTIVE)
+
+# Per-provider limits: requests per minute and tokens per minute
+PROVIDER_LIMITS = {
+    "openai": {
+        "requests": float(os.getenv("OPENAI_RPM", 500)),
+        "tokens": float(os.getenv("OPENAI_TPM", 200000)),
+    },
+    "gemini": {
+        "requests": float(os.getenv("GEMINI_RPM", 60)),
+        "tokens": float(os.getenv("GEMINI_TPM", 1000000)),
+    },
+}
+
+# A waiter that has not polled for this long belongs to a dead process
+_STALE_WAITER_SECONDS = 30
+_POLL_INTERVAL = 0.25
+
+
+def estimate_tokens(prompt: str, max_output_tokens: int = 2000) -> int:
+    """
+    Rough token estimate for budgeting (~4 characters per token plus the
+    expected answer). Corrected with the real usage after the call.
+    """
+    return len(prompt) // 4 + max_output_tokens
+
+
+class ProviderRateLimiter:
+    """
+    Token-bucket rate limiter shared by all worker processes on a host.
+
+    Bucket levels and the queue of waiting callers live in a small SQLite
+    file; every check-and-take runs in a `BEGIN IMMEDIATE` transaction, which
+    serialises it across processes. Each provider has a request bucket and a
+    token bucket, both refilled continuously up to one minute's allowance.
+    Waiters are served strictly by (priority, arrival), so an interactive
+    request queued behind batch work goes first.
+    """
+
+    def __init__(self, path=None, limits=None):
+        self.path = path or os.getenv("RATE_LIMIT_DB", DEFAULT_RATE_LIMIT_DB)
+        self.limits = limits or PROVIDER_LIMITS
+        self._local = threading.local()
+        self._init_db()
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            self._local.conn = conn
+        return conn
+
+    def _init_db(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS buckets ("
+            " provider TEXT, kind TEXT, level REAL, updated REAL,"
+            " PRIMARY KEY (provider, kind))"
+        )
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS waiters ("
+            " ticket INTEGER PRIMARY KEY AUTOINCREMENT,"
+            " provider TEXT, priority INTEGER, heartbeat REAL)"
+        )
+
+    def _refill(self, conn, provider, now):
+        """
+        Return the current {kind: level} of the provider's buckets.
+        """
+        levels = {}
+        for kind, per_minute in self.limits[provider].items():
+            row = conn.execute(
+                "SELECT level, updated FROM buckets WHERE provider = ? AND kind = ?",
+                (provider, kind)
+            ).fetchone()
+            if row is None:
+                levels[kind] = per_minute
+            else:
+                levels[kind] = min(per_minute, row[0] + (now - row[1]) * per_minute / 60.0)
+        return levels
+
+    def _store(self, conn, provider, levels, now):
+        for kind, level in levels.items():
+            conn.execute(
+                "INSERT OR REPLACE INTO buckets (provider, kind, level, updated) VALUES (?, ?, ?, ?)",
+                (provider, kind, level, now)
+            )
+
+    def acquire(self, provider, tokens, priority=None, max_wait=RATE_LIMIT_MAX_WAIT):
+        """
+        Block until one request and `tokens` tokens are available for the
+        provider and it is this caller's turn.
+
+        Raises:
+            TimeoutError: If the budget did not free up within `max_wait` seconds.
+        """
+        if provider not in self.limits:
+            return
+        priority = request_priority.get() if priority is None else priority
+        # Never ask for more than a full bucket, or the request could wait forever
+        tokens = min(tokens, self.limits[provider]["tokens"])
+        conn = self._conn()
+        deadline = time.monotonic() + max_wait
+
+        ticket = conn.execute(
+            "INSERT INTO waiters (provider, priority, heartbeat) VALUES (?, ?, ?)",
+            (provider, priority, time.time())
+        ).lastrowid
+        try:
+            while True:
+                now = time.time()
+                conn.execute("BEGIN IMMEDIATE")
+                try:
+                    conn.execute(
+                        "DELETE FROM waiters WHERE heartbeat < ?", (now - _STALE_WAITER_SECONDS,)
+                    )
+                    conn.execute("UPDATE waiters SET heartbeat = ? WHERE ticket = ?", (now, ticket))
+                    ahead = conn.execute(
+                        "SELECT COUNT(*) FROM waiters WHERE provider = ?"
+                        " AND (priority < ? OR (priority = ? AND ticket < ?))",
+                        (provider, priority, priority, ticket)
+                    ).fetchone()[0]
+
+                    wait_for = _POLL_INTERVAL
+                    if not ahead:
+                        levels = self._refill(conn, provider, now)
+                        need = {"requests": 1, "tokens": tokens}
+                        if all(levels[k] >= need[k] for k in levels):
+                            self._store(conn, provider, {k: levels[k] - need[k] for k in levels}, now)
+                            conn.execute("DELETE FROM waiters WHERE ticket = ?", (ticket,))
+                            conn.execute("COMMIT")
+                            return
+                        # Sleep until the emptiest bucket has refilled enough
+                        wait_for = max(
+                            (need[k] - levels[k]) * 60.0 / self.limits[provider][k]
+                            for k in levels if levels[k] < need[k]
+                        )
+                    conn.execute("COMMIT")
+                except Exception:
+                    conn.execute("ROLLBACK")
+                    raise
+
+                if time.monotonic() + min(wait_for, _POLL_INTERVAL) > deadline:
+                    raise TimeoutError(f"Rate limit budget for {provider} not available in time.")
+                time.sleep(min(wait_for, _POLL_INTERVAL))
+        except BaseException:
+            conn.execute("DELETE FROM waiters WHERE ticket = ?", (ticket,))
+            raise
+
+    def adjust(self, provider, delta_tokens):
+        """
+        Correct the token bucket once the real usage of a call is known
+        (positive delta = the call used more than was reserved).
+        """
+        if provider not in self.limits or not delta_tokens:
+            return
+        conn = self._conn()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            levels = self._refill(conn, provider, now)
+            levels["tokens"] -= delta_tokens
+            self._store(conn, provider, levels, now)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    @contextmanager
+    def limit(self, provider, estimated_tokens):
+        """
+        Reserve budget for one call; set `slot.actual_tokens` inside the block
+        to settle the difference to the estimate afterwards.
+        """
+        self.acquire(provider, estimated_tokens)
+        slot = _Slot()
+        yield slot
+        if slot.actual_tokens is not None:
+            try:
+                self.adjust(provider, slot.actual_tokens - estimated_tokens)
+            except Exception:
+                logging.exception("Failed to settle rate limit usage for %s", provider)
+
+
+class _Slot:
+    actual_tokens = None
+
+
+# The process-wide limiter; its database is opened on the first call
+_rate_limiter = None
+_rate_limiter_lock = threading.Lock()
+
+
+def _load_rate_limiter() -> ProviderRateLimiter:
+    global _rate_limiter
+    if _rate_limiter is None:
+        with _rate_limiter_lock:
+            if _rate_limiter is None:
+                _rate_limiter = ProviderRateLimiter()
+    return _rate_limiter
+
+
+def limit(provider, estimated_tokens):
+    """
+    Reserve budget for one call with the process-wide limiter (see
+    ProviderRateLimiter.limit), creating it on first use.
+    """
+    return _load_rate_limiter().limit(provider, estimated_tokens)
@@ -0,0 +1,66 @@
+import logging
+import threading
+from datetime import datetime, timedelta, timezone
+
+
+def retention_cutoff(days):
+    """
+    Naive UTC timestamp `days` days ago, comparable with stored dates.
+    """
+    return datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(days=days)
+
+
+def purge_expired(data_manager, retention_days, error_log_retention_days=0, batch_size=200,
+                  vacuum=True) -> dict:
+    """
+    Apply the retention policy once.
+
+    Uploads older than `retention_days` are deleted with everything derived
+    from them (see PDFDataManager.delete_pdfs), in batches of `batch_size`.
+    Error logs older than `error_log_retention_days` are deleted even if
+    their upload is kept, and page cache entries not seen within the upload
+    retention period are dropped. A period of 0 keeps that data forever.
+    Finally the freed pages are released with an incremental vacuum.
+
+    Must be called inside an application context.
+
+    Returns:
+        dict: Counts of deleted uploads, error logs, cache entries and
+        released pages.
+    """
+    stats = {'uploads': 0, 'error_logs': 0, 'page_cache': 0, 'pages_released': 0}
+    if retention_days:
+        cutoff = retention_cutoff(retention_days)
+        stats['uploads'] = data_manager.pdf_manager.purge_uploaded_before(cutoff, batch_size)
+        stats['page_cache'] = data_manager.page_cache_manager.purge_before(cutoff)
+    if error_log_retention_days:
+        stats['error_logs'] = data_manager.errorlog_manager.purge_before(retention_cutoff(error_log_retention_days))
+    if vacuum and any(stats.values()):
+        stats['pages_released'] = data_manager.vacuum()
+    logging.info("Retention purge: %s", stats)
+    return stats
+
+
+def start_purge_thread(app, data_manager, interval) -> threading.Thread:
+    """
+    Run `purge_expired` with the app's RETENTION_DAYS and
+    ERROR_LOG_RETENTION_DAYS every `interval` seconds in a daemon thread.
+    The first run happens one interval after start-up.
+    """
+    def loop():
+        while not stop.wait(interval):
+            try:
+                with app.app_context():
+                    purge_expired(
+                        data_manager,
+                        app.config['RETENTION_DAYS'],
+                        app.config['ERROR_LOG_RETENTION_DAYS'],
+                    )
+            except Exception:
+                logging.exception("Retention purge failed")
+
+    stop = threading.Event()
+    thread = threading.Thread(target=loop, name='retention-purge', daemon=True)
+    thread.stop = stop
+    thread.start()
+    return thread
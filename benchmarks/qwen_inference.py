@@ -0,0 +1,125 @@
+"""
+Compare the local Qwen runtimes (see QWEN_RUNTIME in qwen_processing.py).
+
+Each runtime runs in a fresh interpreter so load time and resident memory
+are not skewed by a previously loaded model. Per runtime the probe loads
+the model, does one short warm-up generation and then generates for a
+report prompt built from a synthetic OCR text `--runs` times.
+
+Reported per runtime: load time, median prefill time (a one-token
+generation), median latency per prompt, generated tokens per second and
+RSS (after loading and peak). `--prefix-cache both` runs every runtime with
+and without reuse of the prompt preamble's KV cache (QWEN_PREFIX_CACHE).
+
+Usage:
+    python benchmarks/qwen_inference.py [--runtimes fp16,int8,onnx,onnx-int8]
+                                        [--runs 3] [--max-new-tokens 128] [--threads N]
+                                        [--prefix-cache on|off|both]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+_PROBE = """
+import json, resource, statistics, sys, time
+
+def rss_mb(peak=False):
+    if peak or sys.platform != "linux":
+        scale = 1024 * 1024 if sys.platform == "darwin" else 1024
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * resource.getpagesize() / (1024 * 1024)
+
+from app.services import qwen_processing
+from app.services.pdf_processing import build_prompt
+
+text = "\\n".join(
+    f"Hippocampus links Volumen {{3.1 + i / 100:.2f}} ml, Perzentile {{10 + i}}, Referenzbereich 2.8-3.9 ml"
+    for i in range(40)
+)
+prompt = build_prompt({{"raw_text": "Volumetrie-Bericht\\n" + text}})
+
+start = time.perf_counter()
+qwen_processing._load_qwen()
+load_seconds = time.perf_counter() - start
+rss_loaded = rss_mb()
+
+qwen_processing._generate(prompt, max_new_tokens=1)  # warm-up; also fills the preamble cache
+
+prefill = []
+for _ in range({runs}):
+    start = time.perf_counter()
+    qwen_processing._generate(prompt, max_new_tokens=1)
+    prefill.append(time.perf_counter() - start)
+
+latencies, tokens = [], []
+for _ in range({runs}):
+    start = time.perf_counter()
+    _, generated = qwen_processing._generate(prompt, max_new_tokens={max_new_tokens})
+    latencies.append(time.perf_counter() - start)
+    tokens.append(generated)
+
+print(json.dumps({{
+    "load_seconds": load_seconds,
+    "prefill": statistics.median(prefill),
+    "latency": statistics.median(latencies),
+    "tokens_per_second": sum(tokens) / sum(latencies),
+    "prompt_tokens": len(qwen_processing._load_qwen()[0](prompt)["input_ids"]),
+    "rss_loaded_mb": rss_loaded,
+    "rss_peak_mb": rss_mb(peak=True),
+}}))
+"""
+
+
+def measure(runtime: str, runs: int, max_new_tokens: int, threads: int | None, prefix_cache: bool) -> dict:
+    env = dict(os.environ, QWEN_RUNTIME=runtime, QWEN_PREFIX_CACHE="true" if prefix_cache else "false")
+    if threads:
+        env["QWEN_THREADS"] = str(threads)
+    proc = subprocess.run(
+        [sys.executable, "-c", _PROBE.format(runs=runs, max_new_tokens=max_new_tokens)],
+        cwd=ROOT, env=env, capture_output=True, text=True,
+    )
+    if proc.returncode != 0:
+        return {"error": (proc.stderr.strip().splitlines() or ["failed"])[-1]}
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runtimes", default="fp16,int8,onnx,onnx-int8")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--max-new-tokens", type=int, default=128)
+    parser.add_argument("--threads", type=int, help="QWEN_THREADS for every runtime (default: one per CPU).")
+    parser.add_argument("--prefix-cache", choices=("on", "off", "both"), default="on")
+    args = parser.parse_args()
+    prefix_modes = {"on": (True,), "off": (False,), "both": (False, True)}[args.prefix_cache]
+
+    header = (f"{'runtime':<14} {'load s':>7} {'prefill s':>10} {'latency s':>10} {'tok/s':>7} "
+              f"{'RSS MB':>8} {'peak MB':>8}")
+    print(header)
+    print("-" * len(header))
+    failed = False
+    prompt_tokens = "?"
+    for runtime in [r.strip() for r in args.runtimes.split(",") if r.strip()]:
+        for prefix_cache in prefix_modes:
+            label = runtime + ("+prefix" if prefix_cache and len(prefix_modes) > 1 else "")
+            result = measure(runtime, args.runs, args.max_new_tokens, args.threads, prefix_cache)
+            if "error" in result:
+                failed = True
+                print(f"{label:<14} error: {result['error']}")
+                continue
+            prompt_tokens = result["prompt_tokens"]
+            print(f"{label:<14} {result['load_seconds']:>7.1f} {result['prefill']:>10.2f} {result['latency']:>10.2f} "
+                  f"{result['tokens_per_second']:>7.1f} {result['rss_loaded_mb']:>8.0f} {result['rss_peak_mb']:>8.0f}")
+    print(f"prompt: {prompt_tokens} tokens, max_new_tokens={args.max_new_tokens}, runs={args.runs}, "
+          f"threads={args.threads or os.cpu_count()}")
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""
+Latency of a report request in single-request mode versus fan-out mode
+(REPORT_FAN_OUT in pdf_processing.py).
+
+Builds the report prompt for an OCR text and sends it through the given
+provider alternately with and without fan-out, `--runs` times each, so
+both modes see the same provider load. Calls the real provider API, so the
+provider's API key must be configured.
+
+Usage:
+    python benchmarks/report_fanout.py [--provider openai|gemini] [--text ocr.txt] [--runs 3]
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.services import pdf_processing  # noqa: E402
+
+
+def synthetic_text() -> str:
+    lines = [
+        f"Hippocampus links Volumen {3.1 + i / 100:.2f} ml, Perzentile {10 + i}, Referenzbereich 2.8-3.9 ml"
+        for i in range(40)
+    ]
+    return "Volumetrie-Bericht\n" + "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--provider", choices=("openai", "gemini"), default="openai")
+    parser.add_argument("--text", help="File with OCR text to report on (default: a synthetic volumetry report).")
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+
+    if args.text:
+        with open(args.text, encoding="utf-8") as f:
+            text = f.read()
+    else:
+        text = synthetic_text()
+    prompt = pdf_processing.build_prompt({"raw_text": text})
+    call = pdf_processing.PROVIDERS[args.provider]
+
+    latencies = {False: [], True: []}
+    for _ in range(args.runs):
+        for fan_out in (False, True):
+            pdf_processing.REPORT_FAN_OUT = fan_out
+            start = time.perf_counter()
+            call(prompt)
+            latencies[fan_out].append(time.perf_counter() - start)
+
+    single = statistics.median(latencies[False])
+    fanned = statistics.median(latencies[True])
+    print(f"provider={args.provider} runs={args.runs} groups={len(pdf_processing.FAN_OUT_GROUPS)}")
+    print(f"single request  median {single:6.2f}s  (min {min(latencies[False]):.2f}s)")
+    print(f"fan-out         median {fanned:6.2f}s  (min {min(latencies[True]):.2f}s)")
+    print(f"speedup {single / fanned:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Cold-start check for a web worker: import run.py and build the app.
+
+Each sample is a fresh interpreter that imports `run` and calls
+`create_app()` against a scratch database, the same work a Gunicorn worker
+does on spawn. Besides timing, it checks that none of the heavy processing
+libraries were imported along the way.
+
+Usage:
+    python benchmarks/startup_time.py [--runs 5] [--budget 1.0] [--importtime]
+
+Exits with status 1 if the median start-up time exceeds the budget (seconds)
+or a heavy module was loaded.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+# Must only be imported when a PDF is processed or a provider is called
+HEAVY_MODULES = (
+    "fitz", "pymupdf", "pytesseract", "PIL", "openai", "google.generativeai",
+    "torch", "transformers", "pyarrow",
+)
+
+_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import run
+run.create_app({{"DATABASE_FILE": {db!r}}})
+elapsed = time.perf_counter() - start
+print(json.dumps({{"seconds": elapsed, "heavy": [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+
+def sample(db_file: str) -> dict:
+    code = _PROBE.format(db=db_file, heavy=HEAVY_MODULES)
+    out = subprocess.run(
+        [sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def import_profile(limit: int = 15) -> list:
+    """
+    Return the `limit` slowest imports of `run` by cumulative time (from -X importtime).
+    """
+    err = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import run"], cwd=ROOT, capture_output=True, text=True
+    ).stderr
+    rows = []
+    for line in err.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = (part.strip() for part in line[len("import time:"):].split("|"))
+        rows.append((int(cumulative), name))
+    return sorted(rows, reverse=True)[:limit]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget", type=float, default=float(os.getenv("STARTUP_BUDGET", 1.0)))
+    parser.add_argument("--importtime", action="store_true", help="Also print the slowest imports.")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        db_file = os.path.join(workdir, "startup.db")
+        sample(db_file)  # first run creates the schema and warms the OS file cache
+        samples = [sample(db_file) for _ in range(args.runs)]
+
+    times = [s["seconds"] for s in samples]
+    heavy = sorted({m for s in samples for m in s["heavy"]})
+    median = statistics.median(times)
+    print(f"import run + create_app(): median {median * 1000:.0f} ms, "
+          f"min {min(times) * 1000:.0f} ms, max {max(times) * 1000:.0f} ms over {args.runs} runs")
+    print(f"budget {args.budget * 1000:.0f} ms; heavy modules loaded: {', '.join(heavy) or 'none'}")
+
+    if args.importtime:
+        print("slowest imports (cumulative):")
+        for micros, name in import_profile():
+            print(f"  {micros / 1000:8.1f} ms  {name}")
+
+    if median > args.budget or heavy:
+        print("FAIL")
+        sys.exit(1)
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+import os
+import tempfile
+import zlib
+
+from sqlalchemy import LargeBinary, Text
+from sqlalchemy.types import TypeDecorator
+
+
+# Prefix of every compressed value. Values without it were stored before
+# compression was introduced (or did not shrink) and are returned as they are;
+# neither a PDF nor UTF-8 report text starts with a NUL byte.
+MAGIC = b'\x00ZL1'
+LEVEL = int(os.getenv('STORAGE_COMPRESSION_LEVEL', 6))
+# Keep the compressed form only if it saves at least this fraction; scanned
+# PDFs are mostly JPEG and barely shrink, and are then not worth inflating on
+# every read.
+MIN_SAVING = 0.05
+CHUNK_SIZE = 1024 * 1024
+
+
+def compress(data: bytes) -> bytes:
+    """
+    Return `data` zlib-compressed behind MAGIC, or unchanged if that does not
+    save at least MIN_SAVING.
+    """
+    packed = MAGIC + zlib.compress(data, LEVEL)
+    return packed if len(packed) <= len(data) * (1 - MIN_SAVING) else data
+
+
+def decompress(data: bytes) -> bytes:
+    """
+    Inverse of `compress`; values without the MAGIC prefix pass through.
+    """
+    if data[:len(MAGIC)] == MAGIC:
+        return zlib.decompress(data[len(MAGIC):])
+    return data
+
+
+def compress_file(path: str) -> str | None:
+    """
+    Compress a file chunk by chunk into a temporary file and return its path,
+    or None if compression does not save at least MIN_SAVING. The caller is
+    responsible for deleting the returned file.
+    """
+    size = os.path.getsize(path)
+    fd, packed_path = tempfile.mkstemp(suffix='.zl')
+    try:
+        compressor = zlib.compressobj(LEVEL)
+        with open(path, 'rb') as src, os.fdopen(fd, 'wb') as dst:
+            dst.write(MAGIC)
+            for chunk in iter(lambda: src.read(CHUNK_SIZE), b''):
+                dst.write(compressor.compress(chunk))
+            dst.write(compressor.flush())
+        if os.path.getsize(packed_path) <= size * (1 - MIN_SAVING):
+            return packed_path
+    except Exception:
+        os.remove(packed_path)
+        raise
+    os.remove(packed_path)
+    return None
+
+
+def decompress_chunks(chunks):
+    """
+    Decompress a stream of stored chunks produced by `compress` or
+    `compress_file`; an uncompressed stream is passed through unchanged.
+    """
+    chunks = iter(chunks)
+    head = b''
+    for chunk in chunks:
+        head += chunk
+        if len(head) >= len(MAGIC):
+            break
+    if head[:len(MAGIC)] != MAGIC:
+        if head:
+            yield head
+        yield from chunks
+        return
+
+    decompressor = zlib.decompressobj()
+    # Bound each output piece so a highly compressible chunk cannot expand
+    # into one huge buffer
+    pending = head[len(MAGIC):]
+    while True:
+        while pending:
+            out = decompressor.decompress(pending, CHUNK_SIZE)
+            pending = decompressor.unconsumed_tail
+            if out:
+                yield out
+        chunk = next(chunks, None)
+        if chunk is None:
+            break
+        pending = chunk
+    tail = decompressor.flush()
+    if tail:
+        yield tail
+
+
+class CompressedBlob(TypeDecorator):
+    """
+    Binary column stored zlib-compressed (see `compress`). Rows written
+    before compression are read back unchanged.
+    """
+    impl = LargeBinary
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        if isinstance(value, str):
+            value = value.encode('utf-8')
+        return compress(value) if value else value
+
+    def process_result_value(self, value, dialect):
+        if isinstance(value, (bytes, bytearray, memoryview)):
+            return decompress(bytes(value))
+        return value
+
+
+class CompressedText(TypeDecorator):
+    """
+    Text column stored as zlib-compressed UTF-8 once it is longer than
+    `min_length` bytes; shorter values are stored as plain UTF-8.
+    Rows written as text before compression are read back unchanged.
+
+    Only on SQLite, whose columns take any value, so existing TEXT columns
+    need no migration; other databases keep a plain TEXT column.
+    """
+    impl = Text
+    cache_ok = True
+
+    def __init__(self, min_length=256, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.min_length = min_length
+
+    def load_dialect_impl(self, dialect):
+        if dialect.name == 'sqlite':
+            return dialect.type_descriptor(LargeBinary())
+        return super().load_dialect_impl(dialect)
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        if dialect.name != 'sqlite':
+            return str(value)
+        data = str(value).encode('utf-8')
+        return compress(data) if len(data) > self.min_length else data
+
+    def process_result_value(self, value, dialect):
+        if isinstance(value, (bytes, bytearray, memoryview)):
+            return decompress(bytes(value)).decode('utf-8')
+        return value
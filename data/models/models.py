@@ -1,7 +1,10 @@
 from flask_sqlalchemy import SQLAlchemy
-from sqlalchemy import Column, String, ForeignKey, Text, DateTime
+from sqlalchemy import Column, String, ForeignKey, Text, DateTime, Float, Index, Integer
 from datetime import datetime, timezone
-from sqlalchemy.orm import relationship
+import json
+from sqlalchemy.orm import relationship, deferred
+
+from data.compression import CompressedBlob, CompressedText
 
 db = SQLAlchemy()
 
@@ -46,13 +49,22 @@ class ImageAnalysisPDF(db.Model):
     Stores uploaded image analysis PDFs before processing.
     """
     __tablename__ = 'PDF_IMAGE_ANALYSIS_DATA'
+    __table_args__ = (
+        Index('ix_pdf_user_sha256', 'user_id', 'content_sha256'),
+        Index('ix_pdf_user_updated_at', 'user_id', 'updated_at'),
+        Index('ix_pdf_upload_date', 'upload_date'),  # retention purge
+    )
 
     id = Column(String(26), primary_key=True)
     user_id = Column(String(26), ForeignKey('USERS.id'), nullable=False)
     original_filename = Column(String(255), nullable=False)
     upload_date = Column(DateTime, default=datetime.now(timezone.utc), nullable=False)
-    raw_pdf_blob = Column(Text, nullable=True)  # Can be switched to LargeBinary for raw bytes
+    # Deferred: only loaded on explicit access; streamed via PDFDataManager instead.
+    # Stored zlib-compressed when that pays off (see data/compression.py).
+    raw_pdf_blob = deferred(Column(CompressedBlob, nullable=True))
     processing_status = Column(String(100), nullable=True)
+    content_sha256 = Column(String(64), nullable=True)  # strong ETag for serving the PDF
+    updated_at = Column(DateTime, nullable=True)  # last processing_status change; cursor for /api/status
 
     def __repr__(self):
         return f'<ImageAnalysisPDF {self.original_filename}>'
@@ -71,22 +83,33 @@ class ProcessedImageAnalysisData(db.Model):
     modality     = Column(String(100), nullable=True)
 
     # --- English Reports (Original) ---
+    # Long sections are stored compressed (see data/compression.py)
     report_section_short_openai = Column(Text, nullable=True)
-    report_section_long_openai  = Column(Text, nullable=True)
+    report_section_long_openai  = Column(CompressedText, nullable=True)
     report_section_short_gemini = Column(Text, nullable=True)
-    report_section_long_gemini  = Column(Text, nullable=True)
+    report_section_long_gemini  = Column(CompressedText, nullable=True)
 
     # --- GERMAN REPORTS (NEW) ---
     report_section_short_openai_de = Column(Text, nullable=True)
-    report_section_long_openai_de  = Column(Text, nullable=True)
+    report_section_long_openai_de  = Column(CompressedText, nullable=True)
     report_section_short_gemini_de = Column(Text, nullable=True)
-    report_section_long_gemini_de  = Column(Text, nullable=True)
+    report_section_long_gemini_de  = Column(CompressedText, nullable=True)
 
     report_quality_score = Column(String(10), nullable=True)
+    # JSON {provider stage: provider that produced its sections}, only for sections
+    # written by a stand-in (a hedging fallback such as the local Qwen model)
+    section_sources      = Column(String(255), nullable=True)
     created_at           = Column(DateTime, default=datetime.now(timezone.utc), nullable=False)
+    updated_at           = Column(DateTime, nullable=True)  # set when stages are recomputed
 
     pdf_data = relationship("ImageAnalysisPDF", backref="processed_reports")
 
+    def section_source(self, stage):
+        """
+        Return the provider that produced the sections stored for `stage`.
+        """
+        return json.loads(self.section_sources or '{}').get(stage, stage)
+
     def __repr__(self):
         return f'<ProcessedData {self.id}>'
 
@@ -94,8 +117,16 @@ class ProcessedImageAnalysisData(db.Model):
 class Finding(db.Model):
     """
     Captures individual structured findings from processed image data.
+
+    `value` keeps the value as reported by the vendor; `value_numeric` and
+    `percentile` are parsed copies used for range queries across reports.
     """
     __tablename__ = 'FINDINGS'
+    __table_args__ = (
+        Index('ix_findings_processed_data_id', 'processed_data_id'),
+        Index('ix_findings_type_value', 'finding_type', 'value_numeric'),
+        Index('ix_findings_type_percentile', 'finding_type', 'percentile'),
+    )
 
     id = Column(String(26), primary_key=True)
     processed_data_id = Column(String(26), ForeignKey('PROCESSED_IMAGE_ANALYSIS_DATA.id'), nullable=False)
@@ -104,11 +135,57 @@ class Finding(db.Model):
     value = Column(String(50), nullable=True)
     unit = Column(String(50), nullable=True)
     significance = Column(String(255), nullable=True)
+    value_numeric = Column(Float, nullable=True)
+    percentile = Column(Float, nullable=True)
 
     def __repr__(self):
         return f'<Finding {self.finding_type} at {self.location}>'
 
 
+class PipelineArtifact(db.Model):
+    """
+    Output of one processing stage (extracted text, prompt, provider response)
+    for an uploaded PDF, tagged with the version of the code/config that
+    produced it, so only outdated stages need to be recomputed.
+    """
+    __tablename__ = 'PIPELINE_ARTIFACTS'
+    __table_args__ = (
+        Index('ix_artifacts_pdf_stage', 'pdf_data_id', 'stage', 'version', unique=True),
+    )
+
+    id = Column(String(26), primary_key=True)
+    pdf_data_id = Column(String(26), ForeignKey('PDF_IMAGE_ANALYSIS_DATA.id'), nullable=False)
+    stage = Column(String(50), nullable=False)
+    version = Column(String(64), nullable=False)
+    content = Column(Text, nullable=False)  # JSON
+    created_at = Column(DateTime, nullable=False)
+
+    def __repr__(self):
+        return f'<PipelineArtifact {self.stage}@{self.version} for {self.pdf_data_id}>'
+
+
+class PageTextCache(db.Model):
+    """
+    OCR text of recurring vendor pages (legends, disclaimers, methodology),
+    keyed by a hash of the page thumbnail.
+
+    An entry is only served once the same page produced the same text in
+    `doc_count` distinct documents, so patient-specific pages never hit.
+    """
+    __tablename__ = 'PAGE_TEXT_CACHE'
+
+    page_hash = Column(String(64), primary_key=True)
+    text = Column(Text, nullable=False)
+    doc_count = Column(Integer, nullable=False, default=1)
+    # JSON list of the distinct documents the text was seen in (capped, see PageCacheManager)
+    doc_keys = Column(Text, nullable=True)
+    hits = Column(Integer, nullable=False, default=0)
+    last_seen = Column(DateTime, nullable=False)
+
+    def __repr__(self):
+        return f'<PageTextCache {self.page_hash} ({self.doc_count} docs)>'
+
+
 class ErrorLog(db.Model):
     """
     Logs technical errors that occur during PDF processing.
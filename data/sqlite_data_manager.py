@@ -1,7 +1,17 @@
+import hashlib
+import json
+import os
+import re
+import tempfile
 from abc import ABC
 from datetime import datetime, timezone
 from flask_login import LoginManager
-from data.models.models import User, ImageAnalysisPDF, ProcessedImageAnalysisData, ErrorLog, db
+from sqlalchemy import bindparam, delete, event, func, inspect, insert, select, text, update
+from data.compression import compress_file, decompress_chunks
+from data.models.models import (
+    User, ImageAnalysisPDF, ProcessedImageAnalysisData, Finding, ErrorLog, PageTextCache, PipelineArtifact, db
+)
+from data.user_cache import user_cache
 from utils.helpers import generate_unique_id
 
 
@@ -30,6 +40,9 @@ class DataManagerInterface(ABC):
         self.processed_manager = ProcessedDataManager()
         self.finding_manager = FindingDataManager()
         self.errorlog_manager = ErrorLogManager()
+        self.search_manager = ReportSearchManager()
+        self.page_cache_manager = PageCacheManager()
+        self.artifact_manager = ArtifactManager()
 
         self.login_manager = LoginManager()
         self.login_manager.init_app(self.app)
@@ -37,7 +50,80 @@ class DataManagerInterface(ABC):
 
         db.init_app(self.app)
         with self.app.app_context():
+            self._enable_incremental_vacuum()
             db.create_all()
+            self._upgrade_schema()
+            self.search_manager.setup()
+
+    @staticmethod
+    def _enable_incremental_vacuum():
+        """
+        Create new SQLite databases with auto_vacuum=INCREMENTAL, so pages
+        freed by purges can be returned to the file system without a full
+        VACUUM. The mode can only be set while the database is empty;
+        existing databases are converted by `vacuum(full=True)`.
+        """
+        engine = db.engine
+        if engine.dialect.name != 'sqlite':
+            return
+        with engine.connect().execution_options(isolation_level='AUTOCOMMIT') as conn:
+            if not inspect(conn).get_table_names():
+                conn.exec_driver_sql('PRAGMA auto_vacuum = INCREMENTAL')
+                conn.exec_driver_sql('VACUUM')  # writes the mode into the new file's header
+
+    @staticmethod
+    def vacuum(full=False, step=1000):
+        """
+        Return free pages to the file system after large deletes.
+
+        With auto_vacuum=INCREMENTAL this releases the free list `step` pages
+        per transaction, so writers are never blocked for long. `full=True`
+        runs a full VACUUM instead (rewriting the whole file), which also
+        switches a database created without it to incremental mode.
+
+        Returns:
+            int: Number of pages released.
+        """
+        engine = db.engine
+        if engine.dialect.name != 'sqlite':
+            return 0
+        with engine.connect().execution_options(isolation_level='AUTOCOMMIT') as conn:
+            free_before = conn.exec_driver_sql('PRAGMA freelist_count').scalar()
+            if full:
+                conn.exec_driver_sql('PRAGMA auto_vacuum = INCREMENTAL')
+                conn.exec_driver_sql('VACUUM')
+            elif conn.exec_driver_sql('PRAGMA auto_vacuum').scalar() == 2:
+                while conn.exec_driver_sql('PRAGMA freelist_count').scalar():
+                    conn.exec_driver_sql(f'PRAGMA incremental_vacuum({int(step)})')
+            else:
+                return 0
+            return free_before - conn.exec_driver_sql('PRAGMA freelist_count').scalar()
+
+    @staticmethod
+    def _upgrade_schema():
+        """
+        Bring tables that already exist up to date with the models.
+
+        `create_all()` skips existing tables entirely, so columns and indexes
+        added to a model later are created here. Only nullable columns are
+        added, which keeps this safe to run on every start-up.
+        """
+        engine = db.engine
+        inspector = inspect(engine)
+        existing_tables = set(inspector.get_table_names())
+
+        with engine.begin() as conn:
+            for table in db.metadata.sorted_tables:
+                if table.name not in existing_tables:
+                    continue
+                existing_cols = {c['name'] for c in inspector.get_columns(table.name)}
+                for column in table.columns:
+                    if column.name in existing_cols or not column.nullable:
+                        continue
+                    col_type = column.type.compile(dialect=engine.dialect)
+                    conn.execute(text(f'ALTER TABLE "{table.name}" ADD COLUMN "{column.name}" {col_type}'))
+                for index in table.indexes:
+                    index.create(bind=conn, checkfirst=True)
 
 
 class UserDataManager:
@@ -74,6 +160,7 @@ class UserDataManager:
             for key, value in kwargs.items():
                 setattr(user, key, value)
             db.session.commit()
+            user_cache.invalidate(id)
             return user
         except Exception as e:
             db.session.rollback()
@@ -86,6 +173,7 @@ class UserDataManager:
                 return False
             db.session.delete(user)
             db.session.commit()
+            user_cache.invalidate(id)
             return True
 
         except Exception as e:
@@ -118,17 +206,53 @@ class UserDataManager:
 class PDFDataManager:
     """
     Manages ImageAnalysisPDF table operations.
+
+    PDF blobs are streamed between the database and files on disk in chunks
+    (SQLite incremental blob I/O), so uploading, processing or serving a PDF
+    never holds the whole document in Python memory.
     """
 
-    def add_pdf(self, id, user_id, original_filename, upload_date, raw_pdf_blob, processing_status):
+    CHUNK_SIZE = 1024 * 1024
+    # Decompressed copies served to the browser, shared by all requests for the same content
+    SPOOL_DIR = os.getenv('PDF_SPOOL_DIR', os.path.join(tempfile.gettempdir(), 'medimage2report-pdf-spool'))
+    SPOOL_MAX_BYTES = int(os.getenv('PDF_SPOOL_MAX_MB', 256)) * 1024 * 1024
+    # A copy used this recently is never evicted, so a request that just got its path can open it
+    SPOOL_MIN_AGE = 60
+
+    @staticmethod
+    def _sqlite_connection():
+        """
+        Raw sqlite3 connection of the session's current transaction, or None
+        on other databases (which fall back to whole-blob reads and writes).
+        """
+        conn = db.session.connection()
+        if conn.dialect.name != 'sqlite':
+            return None
+        return conn.connection.driver_connection
+
+    def _blob_rowid(self, pdf_id):
+        """
+        Return (rowid, blob length) of a PDF row, without reading the blob.
+        """
+        return db.session.execute(
+            text(f'SELECT rowid, length(raw_pdf_blob) FROM "{ImageAnalysisPDF.__tablename__}" WHERE id = :id'),
+            {'id': pdf_id}
+        ).first()
+
+    def add_pdf(self, id, user_id, original_filename, upload_date, raw_pdf_blob, processing_status,
+                content_sha256=None):
         try:
+            if content_sha256 is None and raw_pdf_blob:
+                content_sha256 = hashlib.sha256(raw_pdf_blob).hexdigest()
             pdf_entry = ImageAnalysisPDF(
                 id=id,
                 user_id=user_id,
                 original_filename=original_filename,
                 upload_date=upload_date,
                 raw_pdf_blob=raw_pdf_blob,
-                processing_status=processing_status
+                processing_status=processing_status,
+                content_sha256=content_sha256,
+                updated_at=datetime.now(timezone.utc)
             )
             db.session.add(pdf_entry)
             db.session.commit()
@@ -137,6 +261,128 @@ class PDFDataManager:
             db.session.rollback()
             raise e
 
+    def add_pdf_file(self, id, user_id, original_filename, upload_date, path, processing_status,
+                     content_sha256):
+        """
+        Store a PDF from a file on disk. The file is compressed into a
+        temporary file if that pays off; the row is inserted with a
+        zero-filled blob of the stored size, which is then filled chunk by
+        chunk.
+        """
+        packed = None
+        try:
+            raw = self._sqlite_connection()
+            if raw is None:
+                with open(path, 'rb') as f:
+                    return self.add_pdf(id, user_id, original_filename, upload_date, f.read(),
+                                        processing_status, content_sha256)
+
+            packed = compress_file(path)
+            stored = packed or path
+            db.session.execute(insert(ImageAnalysisPDF).values(
+                id=id,
+                user_id=user_id,
+                original_filename=original_filename,
+                upload_date=upload_date,
+                raw_pdf_blob=func.zeroblob(os.path.getsize(stored)),
+                processing_status=processing_status,
+                content_sha256=content_sha256,
+                updated_at=datetime.now(timezone.utc)
+            ))
+            rowid, _ = self._blob_rowid(id)
+            with open(stored, 'rb') as f, raw.blobopen(ImageAnalysisPDF.__tablename__, 'raw_pdf_blob', rowid) as blob:
+                for chunk in iter(lambda: f.read(self.CHUNK_SIZE), b''):
+                    blob.write(chunk)
+            db.session.commit()
+            return self.get_pdf(id)
+        except Exception as e:
+            db.session.rollback()
+            raise e
+        finally:
+            if packed:
+                os.remove(packed)
+
+    def iter_pdf_chunks(self, pdf_id):
+        """
+        Yield the stored PDF bytes in chunks (nothing if there is no blob).
+        """
+        raw = self._sqlite_connection()
+        if raw is None:
+            data = db.session.execute(
+                select(ImageAnalysisPDF.raw_pdf_blob).where(ImageAnalysisPDF.id == pdf_id)
+            ).scalar()
+            if isinstance(data, str):
+                data = data.encode('utf-8')
+            for start in range(0, len(data or b''), self.CHUNK_SIZE):
+                yield data[start:start + self.CHUNK_SIZE]
+            return
+
+        row = self._blob_rowid(pdf_id)
+        if row is None or not row[1]:
+            return
+        with raw.blobopen(ImageAnalysisPDF.__tablename__, 'raw_pdf_blob', row[0], readonly=True) as blob:
+            yield from decompress_chunks(iter(lambda: blob.read(self.CHUNK_SIZE), b''))
+
+    def spool_pdf(self, pdf_id, dir=None):
+        """
+        Copy a stored PDF into a temporary file (in `dir`, if given) and
+        return its path. The caller is responsible for deleting the file.
+        """
+        fd, path = tempfile.mkstemp(suffix='.pdf', dir=dir)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                for chunk in self.iter_pdf_chunks(pdf_id):
+                    f.write(chunk)
+        except Exception:
+            os.remove(path)
+            raise
+        return path
+
+    def _spool_path(self, content_sha256):
+        return os.path.join(self.SPOOL_DIR, f'{content_sha256}.pdf')
+
+    def spooled_pdf(self, pdf_id, content_sha256):
+        """
+        Return the path of a decompressed copy of a stored PDF for serving.
+
+        The copy is written once per content hash and reused by later
+        requests, e.g. the Range requests of the browser's PDF viewer. It
+        must not be deleted by the caller; the least recently used copies
+        are evicted once the spool exceeds SPOOL_MAX_BYTES.
+        """
+        path = self._spool_path(content_sha256)
+        try:
+            os.utime(path)  # mark as recently used
+            return path
+        except FileNotFoundError:
+            pass
+        os.makedirs(self.SPOOL_DIR, mode=0o700, exist_ok=True)
+        # Written under a temporary name, so concurrent requests never see a partial copy
+        partial = self.spool_pdf(pdf_id, dir=self.SPOOL_DIR)
+        os.replace(partial, path)
+        self._evict_spool()
+        return path
+
+    def _evict_spool(self):
+        now = datetime.now().timestamp()
+        copies = []
+        with os.scandir(self.SPOOL_DIR) as entries:
+            for entry in entries:
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                copies.append((stat.st_mtime, stat.st_size, entry.path))
+        total = sum(size for _, size, _ in copies)
+        for mtime, size, path in sorted(copies):
+            if total <= self.SPOOL_MAX_BYTES or now - mtime < self.SPOOL_MIN_AGE:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
     def get_pdfs_by_user(self, user_id):
         return (
             ImageAnalysisPDF.query
@@ -145,26 +391,147 @@ class PDFDataManager:
             .all()
         )
 
+    def get_pdfs_changed_since(self, user_id, since):
+        """
+        Return the user's uploads added or whose processing_status changed at
+        or after `since` (naive UTC), newest upload first. Served by the
+        (user_id, updated_at) index, so the cost follows the number of changes.
+        """
+        return (
+            ImageAnalysisPDF.query
+            .filter(ImageAnalysisPDF.user_id == user_id, ImageAnalysisPDF.updated_at >= since)
+            .order_by(ImageAnalysisPDF.upload_date.desc())
+            .all()
+        )
+
     def get_pdf(self, pdf_id):
         return ImageAnalysisPDF.query.filter_by(id=pdf_id).first()
 
+    def get_pdf_by_hash(self, user_id, content_sha256):
+        """
+        Return the user's earliest upload with this content hash, or None.
+        """
+        return (
+            ImageAnalysisPDF.query
+            .filter_by(user_id=user_id, content_sha256=content_sha256)
+            .order_by(ImageAnalysisPDF.upload_date)
+            .first()
+        )
+
+    def get_pdf_cache_info(self, pdf_id):
+        """
+        Return the fields needed to answer a conditional request for a PDF
+        (owner, filename, upload date, content hash) without loading the blob.
+
+        Rows stored before hashes were recorded get their hash computed and
+        persisted on first access.
+        """
+        row = db.session.execute(
+            select(
+                ImageAnalysisPDF.id,
+                ImageAnalysisPDF.user_id,
+                ImageAnalysisPDF.original_filename,
+                ImageAnalysisPDF.upload_date,
+                ImageAnalysisPDF.content_sha256,
+            ).where(ImageAnalysisPDF.id == pdf_id)
+        ).first()
+        if row is None or row.content_sha256:
+            return row
+
+        try:
+            digest = hashlib.sha256()
+            for chunk in self.iter_pdf_chunks(pdf_id):
+                digest.update(chunk)
+            db.session.execute(
+                update(ImageAnalysisPDF)
+                .where(ImageAnalysisPDF.id == pdf_id)
+                .values(content_sha256=digest.hexdigest())
+            )
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        return self.get_pdf_cache_info(pdf_id)
+
     def delete_pdf(self, id):
+        return self.delete_pdfs([id]) > 0
+
+    def delete_pdfs(self, ids):
+        """
+        Delete uploads together with everything derived from them: reports,
+        their findings and search index entries, stage artifacts and error
+        logs. One set-based DELETE per table, all in one transaction.
+
+        Returns:
+            int: Number of uploads deleted.
+        """
+        ids = list(ids)
+        if not ids:
+            return 0
         try:
-            pdf_entry = self.get_pdf(id)
-            if pdf_entry:
-                db.session.delete(pdf_entry)
-                db.session.commit()
-                return True
-            return False
-        except Exception as e:
+            hashes = db.session.execute(
+                select(ImageAnalysisPDF.content_sha256)
+                .where(ImageAnalysisPDF.id.in_(ids), ImageAnalysisPDF.content_sha256.isnot(None))
+            ).scalars().all()
+            report_ids = db.session.execute(
+                select(ProcessedImageAnalysisData.id)
+                .where(ProcessedImageAnalysisData.pdf_data_id.in_(ids))
+            ).scalars().all()
+            if report_ids:
+                _search_index.remove_reports(db.session.connection(), report_ids)
+                db.session.execute(delete(Finding).where(Finding.processed_data_id.in_(report_ids)))
+                db.session.execute(
+                    delete(ProcessedImageAnalysisData).where(ProcessedImageAnalysisData.id.in_(report_ids))
+                )
+            db.session.execute(delete(PipelineArtifact).where(PipelineArtifact.pdf_data_id.in_(ids)))
+            db.session.execute(delete(ErrorLog).where(ErrorLog.pdf_data_id.in_(ids)))
+            result = db.session.execute(delete(ImageAnalysisPDF).where(ImageAnalysisPDF.id.in_(ids)))
+            db.session.commit()
+        except Exception:
             db.session.rollback()
-            raise e
+            raise
+        # Served copies must not outlive the uploads (another upload with the
+        # same content simply spools it again)
+        for content_sha256 in hashes:
+            try:
+                os.remove(self._spool_path(content_sha256))
+            except FileNotFoundError:
+                pass
+        return result.rowcount
+
+    def purge_uploaded_before(self, cutoff, batch_size=200):
+        """
+        Delete every upload older than `cutoff` (naive UTC) via `delete_pdfs`,
+        `batch_size` uploads per transaction, so the write lock is held only
+        briefly at a time.
+
+        Returns:
+            int: Number of uploads deleted.
+        """
+        total = 0
+        while True:
+            ids = db.session.execute(
+                select(ImageAnalysisPDF.id)
+                .where(ImageAnalysisPDF.upload_date < cutoff)
+                .order_by(ImageAnalysisPDF.upload_date)
+                .limit(batch_size)
+            ).scalars().all()
+            deleted = self.delete_pdfs(ids)
+            total += deleted
+            if len(ids) < batch_size or not deleted:
+                return total
+
+    def count_uploaded_before(self, cutoff):
+        return db.session.execute(
+            select(func.count()).select_from(ImageAnalysisPDF).where(ImageAnalysisPDF.upload_date < cutoff)
+        ).scalar()
 
     def update_processing_status(self, pdf_id, new_status):
         try:
             pdf_entry = self.get_pdf(pdf_id)
             if pdf_entry:
                 pdf_entry.processing_status = new_status
+                pdf_entry.updated_at = datetime.now(timezone.utc)
                 db.session.commit()
                 return pdf_entry
             return None
@@ -193,7 +560,7 @@ class ProcessedDataManager:
         # --- Add new German fields to the method signature ---
         report_section_short_openai_de, report_section_long_openai_de,
         report_section_short_gemini_de, report_section_long_gemini_de,
-        report_quality_score, created_at
+        report_quality_score, created_at, section_sources=None
     ):
         try:
             entry = ProcessedImageAnalysisData(
@@ -216,6 +583,7 @@ class ProcessedDataManager:
                 report_section_long_gemini_de=report_section_long_gemini_de,
                 # Remaining fields
                 report_quality_score=report_quality_score,
+                section_sources=section_sources,
                 created_at=created_at
             )
             db.session.add(entry)
@@ -228,6 +596,46 @@ class ProcessedDataManager:
     def get_processed_data(self, id):
         return ProcessedImageAnalysisData.query.get(id)
 
+    def update_processed_data(self, id, **kwargs):
+        """
+        Overwrite fields of an existing processed report (used when stages are
+        recomputed). Returns the updated entry or None if it does not exist.
+        """
+        try:
+            entry = db.session.get(ProcessedImageAnalysisData, id)
+            if not entry:
+                return None
+            for key, value in kwargs.items():
+                setattr(entry, key, value)
+            entry.updated_at = datetime.now(timezone.utc)
+            db.session.commit()
+            return entry
+        except Exception:
+            db.session.rollback()
+            raise
+
+    def get_report_cache_info(self, id, section_columns=()):
+        """
+        Return (id, pdf_data_id, user_id, created_at, updated_at) of a
+        processed report, enough to check ownership and answer a conditional
+        request without loading the report texts. Each of `section_columns`
+        is added as a flag that is true if the column is not empty, again
+        without loading its content.
+        """
+        return db.session.execute(
+            select(
+                ProcessedImageAnalysisData.id,
+                ProcessedImageAnalysisData.pdf_data_id,
+                ImageAnalysisPDF.user_id,
+                ProcessedImageAnalysisData.created_at,
+                ProcessedImageAnalysisData.updated_at,
+                *[(func.length(getattr(ProcessedImageAnalysisData, column)) > 0).label(column)
+                  for column in section_columns],
+            )
+            .join(ImageAnalysisPDF, ImageAnalysisPDF.id == ProcessedImageAnalysisData.pdf_data_id)
+            .where(ProcessedImageAnalysisData.id == id)
+        ).first()
+
     def delete_processed_data(self, id):
         try:
             entry = ProcessedImageAnalysisData.query.get(id)
@@ -246,6 +654,49 @@ class ProcessedDataManager:
         """
         return ProcessedImageAnalysisData.query.all()
 
+    EXPORT_COLUMNS = (
+        'id', 'pdf_data_id', 'user_id', 'original_filename',
+        'company_name', 'sequences', 'method_used', 'body_region', 'modality',
+        'report_section_short_openai', 'report_section_long_openai',
+        'report_section_short_gemini', 'report_section_long_gemini',
+        'report_section_short_openai_de', 'report_section_long_openai_de',
+        'report_section_short_gemini_de', 'report_section_long_gemini_de',
+        'report_quality_score', 'section_sources', 'created_at',
+    )
+
+    def iter_export_rows(self, start=None, end=None, user_id=None, batch_size=500):
+        """
+        Stream processed reports as plain dicts, oldest first.
+
+        Only the exported columns are selected (no ORM objects, no relationship
+        loading) and rows are fetched from a server-side cursor `batch_size` at
+        a time, so memory use does not grow with the size of the result.
+
+        :param start: Inclusive lower bound on `created_at`.
+        :param end: Exclusive upper bound on `created_at`.
+        :param user_id: Restrict to this user's uploads.
+        """
+        columns = [
+            getattr(ImageAnalysisPDF, c) if c in ('user_id', 'original_filename')
+            else getattr(ProcessedImageAnalysisData, c)
+            for c in self.EXPORT_COLUMNS
+        ]
+        stmt = (
+            select(*columns)
+            .join(ImageAnalysisPDF, ImageAnalysisPDF.id == ProcessedImageAnalysisData.pdf_data_id)
+            .order_by(ProcessedImageAnalysisData.created_at, ProcessedImageAnalysisData.id)
+        )
+        if start is not None:
+            stmt = stmt.where(ProcessedImageAnalysisData.created_at >= start)
+        if end is not None:
+            stmt = stmt.where(ProcessedImageAnalysisData.created_at < end)
+        if user_id:
+            stmt = stmt.where(ImageAnalysisPDF.user_id == user_id)
+
+        result = db.session.execute(stmt.execution_options(stream_results=True, yield_per=batch_size))
+        for row in result:
+            yield dict(row._mapping)
+
     def get_by_pdf_id(self, pdf_id):
         """
         Return the first processed report matching the given PDF ID.
@@ -261,31 +712,373 @@ class FindingDataManager:
     Manages Findings table operations.
     """
 
-    def add_finding(self, id, processed_data_id, finding_type, location, value, unit, significance):
+    _NUMBER_RE = re.compile(r"[-+]?\d+(?:[.,]\d+)?")
+
+    @classmethod
+    def _to_float(cls, value):
+        """
+        Parse the first number out of a vendor value such as '3,42 ml' or '<5'.
+        German decimal commas are accepted. Returns None if nothing numeric is found.
+        """
+        if value is None:
+            return None
+        if isinstance(value, (int, float)):
+            return float(value)
+        match = cls._NUMBER_RE.search(str(value))
+        if not match:
+            return None
+        return float(match.group(0).replace(',', '.'))
+
+    @staticmethod
+    def _clip(value, length):
+        """
+        Return `value` as a string cut to the column length; None stays None.
+        """
+        return None if value is None else str(value)[:length]
+
+    def _build_row(self, processed_data_id, finding):
+        value = finding.get('value')
+        return {
+            'id': finding.get('id') or generate_unique_id(),
+            'processed_data_id': processed_data_id,
+            'finding_type': self._clip(finding.get('finding_type') or finding.get('type') or 'unspecified', 100),
+            'location': self._clip(finding.get('location'), 100),
+            'value': self._clip(value, 50),
+            'unit': self._clip(finding.get('unit'), 50),
+            'significance': self._clip(finding.get('significance'), 255),
+            'value_numeric': self._to_float(value),
+            'percentile': self._to_float(finding.get('percentile')),
+        }
+
+    def add_finding(self, id, processed_data_id, finding_type, location, value, unit, significance,
+                    percentile=None):
         """
         Add structured finding from processed output.
 
-        :return:
+        :return: The created Finding.
         """
-        pass
+        try:
+            row = self._build_row(processed_data_id, {
+                'id': id,
+                'finding_type': finding_type,
+                'location': location,
+                'value': value,
+                'unit': unit,
+                'significance': significance,
+                'percentile': percentile,
+            })
+            entry = Finding(**row)
+            db.session.add(entry)
+            db.session.commit()
+            return entry
+        except Exception:
+            db.session.rollback()
+            raise
+
+    def add_findings(self, processed_data_id, findings):
+        """
+        Bulk-insert all findings of one report in a single executemany round trip.
+
+        :param processed_data_id: The processed report the findings belong to.
+        :param findings: Iterable of dicts with the keys `finding_type` (or `type`),
+                         `location`, `value`, `unit`, `significance` and `percentile`.
+        :return: Number of inserted rows.
+        """
+        rows = [self._build_row(processed_data_id, f) for f in findings or [] if isinstance(f, dict)]
+        if not rows:
+            return 0
+        try:
+            db.session.execute(insert(Finding), rows)
+            db.session.commit()
+            return len(rows)
+        except Exception:
+            db.session.rollback()
+            raise
 
     def get_findings_by_processed_id(self, processed_data_id):
         """
         Retrieve findings associated with processed data.
 
         :param processed_data_id:
-        :return:
+        :return: List of Finding objects.
         """
-        pass
+        return (
+            Finding.query
+            .filter_by(processed_data_id=processed_data_id)
+            .order_by(Finding.finding_type, Finding.location)
+            .all()
+        )
+
+    def query_findings(self, finding_type=None, location=None, unit=None,
+                       min_value=None, max_value=None,
+                       min_percentile=None, max_percentile=None,
+                       user_id=None, company_name=None, modality=None, body_region=None,
+                       after_id=None, limit=100):
+        """
+        Filter findings across all reports, e.g. every hippocampal volume below
+        the 5th percentile.
+
+        Results are ordered by finding id and paged with keyset pagination:
+        pass the id of the last row of the previous page as `after_id`. This
+        keeps deep pages as cheap as the first one on large tables. Report-level
+        filters (`user_id`, `company_name`, `modality`, `body_region`) join the
+        parent tables only when used.
+
+        :return: List of Finding objects (at most `limit`).
+        """
+        stmt = select(Finding)
+
+        if finding_type:
+            stmt = stmt.where(Finding.finding_type == finding_type)
+        if location:
+            stmt = stmt.where(Finding.location.ilike(f"%{location}%"))
+        if unit:
+            stmt = stmt.where(Finding.unit == unit)
+        if min_value is not None:
+            stmt = stmt.where(Finding.value_numeric >= min_value)
+        if max_value is not None:
+            stmt = stmt.where(Finding.value_numeric <= max_value)
+        if min_percentile is not None:
+            stmt = stmt.where(Finding.percentile >= min_percentile)
+        if max_percentile is not None:
+            stmt = stmt.where(Finding.percentile <= max_percentile)
+
+        if user_id or company_name or modality or body_region:
+            stmt = stmt.join(
+                ProcessedImageAnalysisData,
+                ProcessedImageAnalysisData.id == Finding.processed_data_id
+            )
+            if company_name:
+                stmt = stmt.where(ProcessedImageAnalysisData.company_name == company_name)
+            if modality:
+                stmt = stmt.where(ProcessedImageAnalysisData.modality == modality)
+            if body_region:
+                stmt = stmt.where(ProcessedImageAnalysisData.body_region == body_region)
+            if user_id:
+                stmt = stmt.join(
+                    ImageAnalysisPDF,
+                    ImageAnalysisPDF.id == ProcessedImageAnalysisData.pdf_data_id
+                ).where(ImageAnalysisPDF.user_id == user_id)
+
+        if after_id:
+            stmt = stmt.where(Finding.id > after_id)
+
+        stmt = stmt.order_by(Finding.id).limit(limit)
+        return db.session.execute(stmt).scalars().all()
+
+    EXPORT_COLUMNS = (
+        'id', 'processed_data_id', 'finding_type', 'location', 'value', 'unit',
+        'value_numeric', 'percentile', 'significance',
+        'company_name', 'modality', 'body_region', 'created_at',
+    )
+
+    def iter_export_rows(self, start=None, end=None, user_id=None, batch_size=500):
+        """
+        Stream findings as plain dicts together with their report's metadata.
+
+        Same cursor-based batching as `ProcessedDataManager.iter_export_rows`;
+        the date range applies to the report's `created_at`.
+        """
+        report_cols = ('company_name', 'modality', 'body_region', 'created_at')
+        columns = [
+            getattr(ProcessedImageAnalysisData, c) if c in report_cols else getattr(Finding, c)
+            for c in self.EXPORT_COLUMNS
+        ]
+        stmt = (
+            select(*columns)
+            .join(ProcessedImageAnalysisData, ProcessedImageAnalysisData.id == Finding.processed_data_id)
+            .order_by(ProcessedImageAnalysisData.created_at, Finding.id)
+        )
+        if start is not None:
+            stmt = stmt.where(ProcessedImageAnalysisData.created_at >= start)
+        if end is not None:
+            stmt = stmt.where(ProcessedImageAnalysisData.created_at < end)
+        if user_id:
+            stmt = (
+                stmt.join(ImageAnalysisPDF, ImageAnalysisPDF.id == ProcessedImageAnalysisData.pdf_data_id)
+                .where(ImageAnalysisPDF.user_id == user_id)
+            )
+
+        result = db.session.execute(stmt.execution_options(stream_results=True, yield_per=batch_size))
+        for row in result:
+            yield dict(row._mapping)
+
+    def replace_findings(self, processed_data_id, findings):
+        """
+        Swap all findings of a report for a new set in one transaction.
+        """
+        try:
+            db.session.execute(delete(Finding).where(Finding.processed_data_id == processed_data_id))
+            rows = [self._build_row(processed_data_id, f) for f in findings or [] if isinstance(f, dict)]
+            if rows:
+                db.session.execute(insert(Finding), rows)
+            db.session.commit()
+            return len(rows)
+        except Exception:
+            db.session.rollback()
+            raise
 
     def delete_finding(self, id):
         """
         Delete a finding by ID.
 
         :param id:
-        :return:
+        :return: True if a finding was deleted.
         """
-        pass
+        try:
+            entry = db.session.get(Finding, id)
+            if entry:
+                db.session.delete(entry)
+                db.session.commit()
+                return True
+            return False
+        except Exception:
+            db.session.rollback()
+            raise
+
+
+class ArtifactManager:
+    """
+    Manages PipelineArtifact table operations.
+    """
+
+    def save_artifact(self, pdf_data_id, stage, version, content):
+        """
+        Store the JSON-serialisable output of a stage, replacing an artifact
+        of the same stage and version.
+        """
+        try:
+            db.session.execute(
+                delete(PipelineArtifact)
+                .where(PipelineArtifact.pdf_data_id == pdf_data_id)
+                .where(PipelineArtifact.stage == stage)
+                .where(PipelineArtifact.version == version)
+            )
+            entry = PipelineArtifact(
+                id=generate_unique_id(),
+                pdf_data_id=pdf_data_id,
+                stage=stage,
+                version=version,
+                content=json.dumps(content, ensure_ascii=False),
+                created_at=datetime.now(timezone.utc)
+            )
+            db.session.add(entry)
+            db.session.commit()
+            return entry
+        except Exception:
+            db.session.rollback()
+            raise
+
+    def get_artifact(self, pdf_data_id, stage, version):
+        """
+        Return the decoded content of a stage artifact, or None if this
+        version has not been computed for the PDF.
+        """
+        entry = (
+            PipelineArtifact.query
+            .filter_by(pdf_data_id=pdf_data_id, stage=stage, version=version)
+            .first()
+        )
+        return json.loads(entry.content) if entry else None
+
+    def get_versions(self, pdf_data_id):
+        """
+        Return {stage: set of stored versions} for a PDF, without loading contents.
+        """
+        versions = {}
+        rows = db.session.execute(
+            select(PipelineArtifact.stage, PipelineArtifact.version)
+            .where(PipelineArtifact.pdf_data_id == pdf_data_id)
+        )
+        for stage, version in rows:
+            versions.setdefault(stage, set()).add(version)
+        return versions
+
+    def prune(self, pdf_data_id, stage, keep_version):
+        """
+        Delete outdated versions of a stage for a PDF.
+        """
+        try:
+            result = db.session.execute(
+                delete(PipelineArtifact)
+                .where(PipelineArtifact.pdf_data_id == pdf_data_id)
+                .where(PipelineArtifact.stage == stage)
+                .where(PipelineArtifact.version != keep_version)
+            )
+            db.session.commit()
+            return result.rowcount
+        except Exception:
+            db.session.rollback()
+            raise
+
+
+class PageCacheManager:
+    """
+    Manages the PageTextCache table used by `extract_pdf_content` to skip OCR
+    of boilerplate pages.
+    """
+
+    def __init__(self, min_docs=3, max_doc_keys=8):
+        self.min_docs = min_docs
+        # Keys kept per entry to recognise repeats; beyond that the count stops growing
+        self.max_doc_keys = max(max_doc_keys, min_docs)
+
+    def lookup(self, page_hash):
+        """
+        Return the cached text for a page hash, or None if the page is unknown
+        or has not yet been confirmed in `min_docs` documents.
+        """
+        entry = db.session.get(PageTextCache, page_hash)
+        if not entry or entry.doc_count < self.min_docs:
+            return None
+        try:
+            entry.hits += 1
+            entry.last_seen = datetime.now(timezone.utc)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+        return entry.text
+
+    def purge_before(self, cutoff, batch_size=1000):
+        """
+        Forget pages not seen since `cutoff` (naive UTC). Unconfirmed entries
+        hold the text of individual documents, so they must not outlive the
+        uploads they came from. Returns the number of entries deleted.
+        """
+        return _delete_in_batches(
+            PageTextCache, PageTextCache.page_hash, PageTextCache.last_seen < cutoff, batch_size
+        )
+
+    def record(self, page_hash, text, doc_key):
+        """
+        Remember the OCR text of a page. Seeing the same text again in a
+        document it was not seen in before counts towards confirmation;
+        different text restarts it.
+        """
+        now = datetime.now(timezone.utc)
+        try:
+            entry = db.session.get(PageTextCache, page_hash)
+            if entry is None:
+                db.session.add(PageTextCache(
+                    page_hash=page_hash, text=text, doc_count=1,
+                    doc_keys=json.dumps([doc_key]), hits=0, last_seen=now
+                ))
+            elif entry.text != text:
+                entry.text = text
+                entry.doc_count = 1
+                entry.doc_keys = json.dumps([doc_key])
+                entry.last_seen = now
+            else:
+                doc_keys = json.loads(entry.doc_keys or '[]')
+                if doc_key not in doc_keys and len(doc_keys) < self.max_doc_keys:
+                    doc_keys.append(doc_key)
+                    entry.doc_keys = json.dumps(doc_keys)
+                    entry.doc_count = len(doc_keys)
+                    entry.last_seen = now
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
 
 
 class ErrorLogManager:
@@ -336,9 +1129,320 @@ class ErrorLogManager:
         """
         Delete all error logs for a given PDF.
         """
-        from data.models.models import ErrorLog
-        entries = ErrorLog.query.filter_by(pdf_data_id=pdf_data_id).all()
-        for entry in entries:
-            db.session.delete(entry)
-        db.session.commit()
-        return len(entries)
\ No newline at end of file
+        try:
+            result = db.session.execute(delete(ErrorLog).where(ErrorLog.pdf_data_id == pdf_data_id))
+            db.session.commit()
+            return result.rowcount
+        except Exception:
+            db.session.rollback()
+            raise
+
+    def purge_before(self, cutoff, batch_size=1000):
+        """
+        Delete error logs older than `cutoff` (naive UTC), `batch_size` per
+        transaction. Returns the number of entries deleted.
+        """
+        return _delete_in_batches(ErrorLog, ErrorLog.id, ErrorLog.timestamp < cutoff, batch_size)
+
+
+class ReportSearchManager:
+    """
+    Full-text search over the generated report sections.
+
+    On SQLite the index is an FTS5 table (REPORTS_FTS), on PostgreSQL a table
+    of tsvectors with GIN indexes (REPORTS_SEARCH). Both hold one row per
+    processed report with the English and German sections in separate
+    columns, so searches can be restricted to one language. The index is
+    kept in sync by the mapper events at the bottom of this module.
+
+    On SQLite the owner and the company/modality/region filters are indexed
+    as extra FTS columns, so filtering happens inside the FTS index and only
+    the top-ranked hits are joined back to the report table.
+    """
+
+    FTS_TABLE = 'REPORTS_FTS'
+    PG_TABLE = 'REPORTS_SEARCH'
+
+    EN_FIELDS = (
+        'report_section_short_openai', 'report_section_long_openai',
+        'report_section_short_gemini', 'report_section_long_gemini',
+    )
+    DE_FIELDS = (
+        'report_section_short_openai_de', 'report_section_long_openai_de',
+        'report_section_short_gemini_de', 'report_section_long_gemini_de',
+    )
+
+    _WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+    @staticmethod
+    def _is_postgres(bind):
+        return bind.dialect.name == 'postgresql'
+
+    @staticmethod
+    def _fts_rowid(report_id):
+        """
+        Stable integer key for a report in the FTS5 table.
+
+        Derived from the report id instead of the SQLite rowid, which may be
+        renumbered by VACUUM on tables without an INTEGER PRIMARY KEY.
+        """
+        return int.from_bytes(hashlib.blake2b(report_id.encode(), digest_size=7).digest(), 'big')
+
+    @classmethod
+    def _document(cls, report):
+        """
+        Return the (english, german) text to index for a report.
+        """
+        en = "\n".join(getattr(report, f) or '' for f in cls.EN_FIELDS)
+        de = "\n".join(getattr(report, f) or '' for f in cls.DE_FIELDS)
+        return en, de
+
+    def setup(self):
+        """
+        Create the search index if it does not exist yet and fill it from the
+        reports already stored.
+        """
+        engine = db.engine
+        with engine.begin() as conn:
+            if self._is_postgres(conn):
+                exists = inspect(conn).has_table(self.PG_TABLE)
+                conn.execute(text(
+                    f'CREATE TABLE IF NOT EXISTS "{self.PG_TABLE}" ('
+                    ' report_id VARCHAR(26) PRIMARY KEY'
+                    '   REFERENCES "PROCESSED_IMAGE_ANALYSIS_DATA"(id) ON DELETE CASCADE,'
+                    ' tsv_en tsvector, tsv_de tsvector)'
+                ))
+                conn.execute(text(
+                    f'CREATE INDEX IF NOT EXISTS ix_reports_search_en ON "{self.PG_TABLE}" USING GIN (tsv_en)'
+                ))
+                conn.execute(text(
+                    f'CREATE INDEX IF NOT EXISTS ix_reports_search_de ON "{self.PG_TABLE}" USING GIN (tsv_de)'
+                ))
+            else:
+                exists = conn.execute(
+                    text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :n"),
+                    {'n': self.FTS_TABLE}
+                ).first() is not None
+                if not exists:
+                    conn.execute(text(
+                        f'CREATE VIRTUAL TABLE "{self.FTS_TABLE}" USING fts5('
+                        ' report_id UNINDEXED, text_en, text_de, owner, company, modality, region,'
+                        " tokenize = 'unicode61 remove_diacritics 2')"
+                    ))
+                    # Rank on the report texts only; the filter columns must not affect scoring.
+                    conn.execute(text(
+                        f'INSERT INTO "{self.FTS_TABLE}" ("{self.FTS_TABLE}", rank)'
+                        " VALUES ('rank', 'bm25(0.0, 1.0, 1.0, 0.0, 0.0, 0.0, 0.0)')"
+                    ))
+        if not exists:
+            self.rebuild()
+
+    def index_report(self, conn, report):
+        """
+        Insert or replace the index entry of one report on the given connection.
+        """
+        en, de = self._document(report)
+        if self._is_postgres(conn):
+            conn.execute(text(
+                f'INSERT INTO "{self.PG_TABLE}" (report_id, tsv_en, tsv_de)'
+                " VALUES (:id, to_tsvector('english', :en), to_tsvector('german', :de))"
+                ' ON CONFLICT (report_id) DO UPDATE'
+                ' SET tsv_en = EXCLUDED.tsv_en, tsv_de = EXCLUDED.tsv_de'
+            ), {'id': report.id, 'en': en, 'de': de})
+            return
+
+        owner = conn.execute(
+            text('SELECT user_id FROM "PDF_IMAGE_ANALYSIS_DATA" WHERE id = :id'),
+            {'id': report.pdf_data_id}
+        ).scalar()
+        params = {
+            'rowid': self._fts_rowid(report.id),
+            'id': report.id,
+            'en': en,
+            'de': de,
+            'owner': owner or '',
+            'company': report.company_name or '',
+            'modality': report.modality or '',
+            'region': report.body_region or '',
+        }
+        conn.execute(text(f'DELETE FROM "{self.FTS_TABLE}" WHERE rowid = :rowid'), params)
+        conn.execute(text(
+            f'INSERT INTO "{self.FTS_TABLE}"'
+            ' (rowid, report_id, text_en, text_de, owner, company, modality, region)'
+            ' VALUES (:rowid, :id, :en, :de, :owner, :company, :modality, :region)'
+        ), params)
+
+    def remove_report(self, conn, report_id):
+        """
+        Drop the index entry of one report on the given connection.
+        """
+        self.remove_reports(conn, [report_id])
+
+    def remove_reports(self, conn, report_ids):
+        """
+        Drop the index entries of several reports with one statement.
+        """
+        if self._is_postgres(conn):
+            stmt = text(f'DELETE FROM "{self.PG_TABLE}" WHERE report_id IN :ids')
+            ids = list(report_ids)
+        else:
+            stmt = text(f'DELETE FROM "{self.FTS_TABLE}" WHERE rowid IN :ids')
+            ids = [self._fts_rowid(report_id) for report_id in report_ids]
+        conn.execute(stmt.bindparams(bindparam('ids', expanding=True)), {'ids': ids})
+
+    def rebuild(self, batch_size=500):
+        """
+        Re-index every stored report, committing in batches.
+        """
+        count = 0
+        last_id = ''
+        while True:
+            batch = (
+                ProcessedImageAnalysisData.query
+                .filter(ProcessedImageAnalysisData.id > last_id)
+                .order_by(ProcessedImageAnalysisData.id)
+                .limit(batch_size)
+                .all()
+            )
+            if not batch:
+                break
+            with db.engine.begin() as conn:
+                for report in batch:
+                    self.index_report(conn, report)
+            count += len(batch)
+            last_id = batch[-1].id
+            db.session.expunge_all()
+        return count
+
+    @classmethod
+    def _phrase(cls, value, prefix=False):
+        """
+        Quote user input as an FTS5 phrase so it cannot inject query operators.
+        """
+        words = cls._WORD_RE.findall(value or '')
+        if not words:
+            return None
+        return '"' + ' '.join(words) + '"' + ('*' if prefix else '')
+
+    @classmethod
+    def _fts_query(cls, query, lang=None, user_id=None, company_name=None, modality=None,
+                   body_region=None):
+        """
+        Build the FTS5 MATCH expression: every search word is quoted,
+        prefix-matched and AND-ed, and each filter becomes a column phrase.
+        """
+        words = cls._WORD_RE.findall(query or '')
+        if not words:
+            return None
+        expr = ' '.join(cls._phrase(w, prefix=True) for w in words)
+        if lang == 'en':
+            expr = f'text_en : ({expr})'
+        elif lang == 'de':
+            expr = f'text_de : ({expr})'
+
+        parts = [f'({expr})']
+        for column, value in (('owner', user_id), ('company', company_name),
+                              ('modality', modality), ('region', body_region)):
+            phrase = cls._phrase(value)
+            if phrase:
+                parts.append(f'{column} : {phrase}')
+        return ' AND '.join(parts)
+
+    def search(self, query, user_id=None, lang=None, company_name=None, modality=None,
+               body_region=None, limit=20, offset=0):
+        """
+        Search report texts, best matches first.
+
+        :param query: Free text, e.g. 'hippocampus atrophy' or 'Hippocampusatrophie'.
+        :param user_id: Restrict to reports of this user's uploads.
+        :param lang: 'en', 'de' or None for both languages.
+        :param company_name, modality, body_region: Optional filters (whole-word match).
+        :return: List of (ProcessedImageAnalysisData, rank) tuples; lower rank is better.
+        """
+        params = {'limit': limit, 'offset': offset}
+
+        if self._is_postgres(db.session.get_bind()):
+            words = self._WORD_RE.findall(query or '')
+            if not words:
+                return []
+            params['q'] = ' '.join(words)
+            en_q = "plainto_tsquery('english', :q)"
+            de_q = "plainto_tsquery('german', :q)"
+            if lang == 'en':
+                match, rank = f's.tsv_en @@ {en_q}', f'ts_rank(s.tsv_en, {en_q})'
+            elif lang == 'de':
+                match, rank = f's.tsv_de @@ {de_q}', f'ts_rank(s.tsv_de, {de_q})'
+            else:
+                match = f'(s.tsv_en @@ {en_q} OR s.tsv_de @@ {de_q})'
+                rank = f'(ts_rank(s.tsv_en, {en_q}) + ts_rank(s.tsv_de, {de_q}))'
+            sql = (
+                f'SELECT p.id, -{rank} AS rank FROM "{self.PG_TABLE}" s'
+                ' JOIN "PROCESSED_IMAGE_ANALYSIS_DATA" p ON p.id = s.report_id'
+                ' JOIN "PDF_IMAGE_ANALYSIS_DATA" pdf ON pdf.id = p.pdf_data_id'
+                f' WHERE {match}'
+            )
+            for column, key, value in (('pdf.user_id', 'user_id', user_id),
+                                       ('p.company_name', 'company', company_name),
+                                       ('p.modality', 'modality', modality),
+                                       ('p.body_region', 'region', body_region)):
+                if value:
+                    sql += f' AND {column} = :{key}'
+                    params[key] = value
+            sql += ' ORDER BY rank LIMIT :limit OFFSET :offset'
+        else:
+            match = self._fts_query(query, lang, user_id, company_name, modality, body_region)
+            if not match:
+                return []
+            params['q'] = match
+            sql = (
+                f'SELECT report_id AS id, rank FROM "{self.FTS_TABLE}"'
+                f' WHERE "{self.FTS_TABLE}" MATCH :q'
+                ' ORDER BY rank LIMIT :limit OFFSET :offset'
+            )
+
+        hits = db.session.execute(text(sql), params).all()
+        if not hits:
+            return []
+        reports = {
+            r.id: r for r in
+            ProcessedImageAnalysisData.query
+            .filter(ProcessedImageAnalysisData.id.in_([h.id for h in hits]))
+            .all()
+        }
+        return [(reports[h.id], h.rank) for h in hits if h.id in reports]
+
+
+def _delete_in_batches(model, key, condition, batch_size):
+    """
+    Delete the rows of `model` matching `condition`, at most `batch_size`
+    per transaction (selected by primary key `key`). Returns the row count.
+    """
+    total = 0
+    while True:
+        try:
+            batch = select(key).where(condition).limit(batch_size).scalar_subquery()
+            deleted = db.session.execute(delete(model).where(key.in_(batch))).rowcount
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        total += deleted
+        if deleted < batch_size:
+            return total
+
+
+# -----------------------------------------------------------------------------
+# Keep the report search index in sync with ORM writes
+# -----------------------------------------------------------------------------
+_search_index = ReportSearchManager()
+
+
+@event.listens_for(ProcessedImageAnalysisData, 'after_insert')
+@event.listens_for(ProcessedImageAnalysisData, 'after_update')
+def _index_report(mapper, connection, target):
+    _search_index.index_report(connection, target)
+
+
+@event.listens_for(ProcessedImageAnalysisData, 'before_delete')
+def _unindex_report(mapper, connection, target):
+    _search_index.remove_report(connection, target.id)
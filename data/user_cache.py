@@ -0,0 +1,98 @@
+import os
+import threading
+import time
+
+from flask_login import UserMixin
+
+
+class CachedUser(UserMixin):
+    """
+    Read-only snapshot of a User row, safe to share across requests and threads.
+
+    Flask-Login only needs the id and the UserMixin properties; the remaining
+    fields are copied so templates can keep using `current_user.name` etc.
+    Nothing here is bound to a database session.
+    """
+
+    def __init__(self, user):
+        self.id = user.id
+        self.email = user.email
+        self.name = user.name
+        self.role = user.role
+        self.created_at = user.created_at
+        self.last_login = user.last_login
+
+    def __repr__(self):
+        return f'<CachedUser {self.name} ({self.email})>'
+
+
+class UserCache:
+    """
+    In-process TTL cache of user principals for the Flask-Login user loader.
+
+    A hit is a single dictionary lookup. Entries expire after `ttl` seconds,
+    which bounds staleness across worker processes; within a process the
+    data managers invalidate entries explicitly whenever a user is updated
+    or deleted. Every invalidation bumps the user's generation, so a row
+    loaded before it is not cached afterwards.
+    """
+
+    def __init__(self, ttl=300, max_size=10000):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._entries = {}
+        self._generations = {}  # user_id -> number of invalidations
+        self._clears = 0
+        self._lock = threading.Lock()
+
+    def _generation(self, user_id):
+        return self._clears, self._generations.get(user_id, 0)
+
+    def get(self, user_id, loader):
+        """
+        Return the cached principal for `user_id`, calling `loader(user_id)`
+        to fetch the User row on a miss. Missing users are not cached.
+        """
+        entry = self._entries.get(user_id)
+        now = time.monotonic()
+        if entry is not None and entry[0] > now:
+            return entry[1]
+
+        with self._lock:
+            generation = self._generation(user_id)
+        user = loader(user_id)
+        if user is None:
+            with self._lock:
+                self._entries.pop(user_id, None)
+            return None
+
+        principal = CachedUser(user)
+        with self._lock:
+            if self._generation(user_id) != generation:
+                # Invalidated while loading: the row may predate the change
+                return principal
+            if len(self._entries) >= self.max_size:
+                self._evict_expired(now)
+            if len(self._entries) >= self.max_size:
+                self._entries.clear()
+            self._entries[user_id] = (now + self.ttl, principal)
+        return principal
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._entries.pop(user_id, None)
+            self._generations[user_id] = self._generations.get(user_id, 0) + 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._generations.clear()
+            self._clears += 1
+
+    def _evict_expired(self, now):
+        expired = [uid for uid, (expires, _) in self._entries.items() if expires <= now]
+        for uid in expired:
+            del self._entries[uid]
+
+
+user_cache = UserCache(ttl=int(os.getenv('USER_CACHE_TTL', 300)))
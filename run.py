@@ -1,16 +1,35 @@
+import hashlib
 import logging
 import os
-from datetime import datetime, timezone
+import sys
+import tempfile
+import threading
+from datetime import datetime, timedelta, timezone
 
+import click
 from dotenv import load_dotenv
-from flask import Flask, redirect, url_for, render_template, abort, request, flash, current_app, Response
+from flask import Flask, Blueprint, redirect, url_for, render_template, abort, request, flash, current_app, \
+    Response, jsonify, stream_with_context, make_response, send_file
 from flask_login import LoginManager, login_user, logout_user, login_required, current_user
+from werkzeug.http import is_resource_modified
+from werkzeug.local import LocalProxy
 from werkzeug.security import generate_password_hash, check_password_hash
 
-from data.models.models import User, ErrorLog, db
+from data.models.models import User, ImageAnalysisPDF, ErrorLog, db
 from data.sqlite_data_manager import DataManagerInterface
+from data.user_cache import user_cache
 from utils.helpers import generate_unique_id
-from app.services.pdf_processing import extract_pdf_content, build_prompt, call_openai, call_gemini
+from app.services.admission import memory_budget
+from app.services.backfill import Checkpoint, discover_pdfs, run_backfill
+from app.services.export import EXPORT_FORMATS, stream_export
+from app.services.hedging import hedge_stats
+from app.services.pipeline import (
+    process_document, stale_stages, stage_versions, deferred_stages, dependent_stages, missing_sections,
+    request_secondary,
+    STAGES, PROVIDER_STAGES, PROVIDER_COLUMNS
+)
+from app.services.rate_limit import request_priority, PRIORITY_BATCH
+from app.services.retention import purge_expired, retention_cutoff, start_purge_thread
 
 
 # Load .env as early as possible
@@ -22,26 +41,98 @@ load_dotenv()
 base_dir     = os.path.abspath(os.path.dirname(__file__))
 template_dir = os.path.join(base_dir, 'app', 'templates')
 static_dir   = os.path.join(base_dir, 'app', 'static')
-db_file      = os.path.join(base_dir, 'data', 'medimage2report.db')
+db_file      = os.getenv('DATABASE_FILE', os.path.join(base_dir, 'data', 'medimage2report.db'))
 
-# ensure data dir
-os.makedirs(os.path.dirname(db_file), exist_ok=True)
+# HTTP caching: uploaded PDFs never change, rendered reports change only
+# with the template, so its hash is folded into the report ETag.
+PDF_CACHE_MAX_AGE = int(os.getenv('PDF_CACHE_MAX_AGE', 86400))
 
-app = Flask(__name__, template_folder=template_dir, static_folder=static_dir)
-app.config.update({
-    'MAX_CONTENT_LENGTH': 10 * 1024 * 1024,      # 10 MB
-    'SQLALCHEMY_DATABASE_URI': f'sqlite:///{db_file}',
-    'SQLALCHEMY_TRACK_MODIFICATIONS': False,
-    'SECRET_KEY': os.getenv('FLASK_SECRET_KEY', generate_unique_id()),  # fallback if unset
-})
+# Status polling: how often the dashboard asks /api/status for changes, and
+# how far each cursor reaches back so a status written just before a poll
+# (timestamped before it, committed after it) is still picked up.
+STATUS_POLL_SECONDS = int(os.getenv('STATUS_POLL_SECONDS', 5))
+STATUS_CURSOR_OVERLAP = timedelta(seconds=2)
+with open(os.path.join(template_dir, 'view_report.html'), 'rb') as _tpl:
+    REPORT_TEMPLATE_HASH = hashlib.sha256(_tpl.read()).hexdigest()[:16]
 
-# Initialize Data Manager
-data_manager = DataManagerInterface(db_file, app)
+# All routes and CLI commands live on this blueprint; create_app() registers it
+main = Blueprint('main', __name__, cli_group=None)
 
 # Set up Flask-Login
 login_manager = LoginManager()
-login_manager.init_app(app)
-login_manager.login_view = 'index'  # or 'login'
+login_manager.login_view = 'main.index'  # or 'login'
+
+# The current app's DataManagerInterface (see create_app)
+data_manager = LocalProxy(lambda: current_app.extensions['data_manager'])
+
+
+def create_app(config: dict | None = None) -> Flask:
+    """
+    Application factory.
+
+    Builds a configured app with its own data manager; `config` overrides
+    the defaults (e.g. DATABASE_FILE for a scratch database). Heavy
+    processing libraries are not imported here but on first use, so a web
+    worker starts with only Flask and SQLAlchemy loaded.
+    """
+    app = Flask(__name__, template_folder=template_dir, static_folder=static_dir)
+    app.config.update({
+        'DATABASE_FILE': db_file,
+        'MAX_CONTENT_LENGTH': 10 * 1024 * 1024,      # 10 MB
+        'SQLALCHEMY_TRACK_MODIFICATIONS': False,
+        'SECRET_KEY': os.getenv('FLASK_SECRET_KEY', generate_unique_id()),  # fallback if unset
+        # Hedged provider requests (see app/services/hedging.py)
+        'PROVIDER_HEDGING': os.getenv('PROVIDER_HEDGING', 'false').lower() in ('1', 'true', 'yes'),
+        'HEDGE_PRIMARY': os.getenv('HEDGE_PRIMARY', 'openai'),
+        'HEDGE_FALLBACKS': [p.strip() for p in os.getenv('HEDGE_FALLBACKS', 'gemini').split(',') if p.strip()],
+        # Only the primary provider runs during processing; the others' sections are generated
+        # in the background right after it ('background'), when the report is first viewed
+        # ('on_view') or together with it ('eager'). See app/services/pipeline.py.
+        'PRIMARY_PROVIDER': os.getenv('PRIMARY_PROVIDER', 'openai'),
+        'SECONDARY_PROVIDER_MODE': os.getenv('SECONDARY_PROVIDER_MODE', 'on_view'),
+        # Retention (see app/services/retention.py); 0 keeps data forever
+        'RETENTION_DAYS': int(os.getenv('RETENTION_DAYS', 0)),
+        'ERROR_LOG_RETENTION_DAYS': int(os.getenv('ERROR_LOG_RETENTION_DAYS', 0)),
+        'RETENTION_PURGE_INTERVAL': int(os.getenv('RETENTION_PURGE_INTERVAL', 3600)),  # seconds; 0 disables
+    })
+    app.config.update(config or {})
+    if app.config['PRIMARY_PROVIDER'] not in PROVIDER_STAGES:
+        raise ValueError(f"PRIMARY_PROVIDER must be one of {', '.join(PROVIDER_STAGES)}.")
+    if app.config['SECONDARY_PROVIDER_MODE'] not in ('eager', 'background', 'on_view'):
+        raise ValueError("SECONDARY_PROVIDER_MODE must be 'eager', 'background' or 'on_view'.")
+
+    # ensure data dir
+    os.makedirs(os.path.dirname(app.config['DATABASE_FILE']), exist_ok=True)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{app.config['DATABASE_FILE']}"
+
+    # Initialize Data Manager
+    app.extensions['data_manager'] = DataManagerInterface(app.config['DATABASE_FILE'], app)
+
+    login_manager.init_app(app)
+    app.register_blueprint(main)
+
+    if app.config['RETENTION_PURGE_INTERVAL'] and (
+            app.config['RETENTION_DAYS'] or app.config['ERROR_LOG_RETENTION_DAYS']):
+        # Started by the first request, so only processes serving the web app
+        # purge in the background, not the CLI commands building the same app
+        app.before_request(lambda: _ensure_purge_thread(app))
+    return app
+
+
+_purge_thread_lock = threading.Lock()
+
+
+def _ensure_purge_thread(app: Flask):
+    """
+    Start the app's retention purge thread unless it is already running.
+    """
+    if 'purge_thread' in app.extensions:
+        return
+    with _purge_thread_lock:
+        if 'purge_thread' not in app.extensions:
+            app.extensions['purge_thread'] = start_purge_thread(
+                app, app.extensions['data_manager'], app.config['RETENTION_PURGE_INTERVAL']
+            )
 
 
 # -----------------------------------------------------------------------------
@@ -72,19 +163,98 @@ def _log_pdf_error(pdf_id: str, exc: Exception):
         # swallow, there's nothing more we can do
         pass
 
+# -----------------------------------------------------------------------------
+# HTTP caching helpers
+# -----------------------------------------------------------------------------
+def _not_modified(etag: str, last_modified: datetime | None) -> bool:
+    """
+    True if the client's cached copy (If-None-Match / If-Modified-Since) is
+    still valid, so a 304 can be sent before doing any expensive work.
+    """
+    return not is_resource_modified(request.environ, etag=etag, last_modified=last_modified)
+
+
+def _apply_cache_headers(response: Response, etag: str, last_modified: datetime | None,
+                         max_age: int = 0) -> Response:
+    """
+    Set validators and private caching headers on a response.
+    max_age=0 means the browser may keep a copy but must revalidate it.
+    """
+    response.set_etag(etag)
+    if last_modified:
+        response.last_modified = last_modified
+    response.cache_control.private = True
+    if max_age:
+        response.cache_control.max_age = max_age
+        response.cache_control.no_cache = None
+    else:
+        response.cache_control.no_cache = True
+    response.vary.add('Cookie')
+    return response
+
+
+# -----------------------------------------------------------------------------
+# Export helpers (shared by the download route and the CLI command)
+# -----------------------------------------------------------------------------
+def _spool_upload(stream, chunk_size: int = 1024 * 1024):
+    """
+    Copy an upload stream to a temporary file chunk by chunk.
+
+    Returns:
+        tuple: (path, size in bytes, SHA-256 hex digest). The caller deletes the file.
+    """
+    digest = hashlib.sha256()
+    size = 0
+    fd, path = tempfile.mkstemp(suffix='.pdf')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            for chunk in iter(lambda: stream.read(chunk_size), b''):
+                digest.update(chunk)
+                size += len(chunk)
+                f.write(chunk)
+    except Exception:
+        os.remove(path)
+        raise
+    return path, size, digest.hexdigest()
+
+
+def _parse_date_range(start: str | None, end: str | None):
+    """
+    Turn 'YYYY-MM-DD' strings into a [start, end) datetime range.
+    The end date is inclusive for the caller, so one day is added.
+    """
+    start_dt = datetime.fromisoformat(start) if start else None
+    end_dt   = datetime.fromisoformat(end) + timedelta(days=1) if end else None
+    return start_dt, end_dt
+
+
+def _export_source(kind: str):
+    """
+    Return the data manager that streams rows for the given export kind.
+    """
+    if kind == 'reports':
+        return data_manager.processed_manager
+    if kind == 'findings':
+        return data_manager.finding_manager
+    raise ValueError(f"Unsupported export kind: {kind}")
+
+
 # -----------------------------------------------------------------------------
 # User‐loader for Flask‐Login
 # -----------------------------------------------------------------------------
 @login_manager.user_loader
-def load_user(user_id: str) -> User | None:
-    with app.app_context():
-        return db.session.get(User, user_id)
+def load_user(user_id: str):
+    """
+    Resolve the session's user id to a cached principal; the database is
+    only hit on a cache miss (first request, TTL expiry or invalidation).
+    """
+    return user_cache.get(user_id, lambda uid: db.session.get(User, uid))
 
 
 # -----------------------------------------------------------------------------
 # Routes
 # -----------------------------------------------------------------------------
-@app.route('/', methods=['GET', 'POST'])
+@main.route('/', methods=['GET', 'POST'])
 def index():
     """
     Login page & handler.
@@ -103,7 +273,7 @@ def index():
                 login_user(user)
                 user.last_login = datetime.now(timezone.utc)
                 data_manager.user_manager.update_user(user.id, last_login=user.last_login)
-                return redirect(url_for('status'))
+                return redirect(url_for('.status'))
             else:
                 flash('Invalid email or password.', 'danger')
         except Exception as e:
@@ -112,7 +282,7 @@ def index():
 
     return render_template('index.html')
 
-@app.route('/register', methods=['GET', 'POST'])
+@main.route('/register', methods=['GET', 'POST'])
 def register():
     """
     Registration Route:
@@ -121,7 +291,7 @@ def register():
     """
     # If already logged in, send the user to their dashboard
     if current_user.is_authenticated:
-        return redirect(url_for('status'))
+        return redirect(url_for('.status'))
 
     if request.method == 'POST':
         email = (request.form.get('email') or '').strip()
@@ -154,7 +324,7 @@ def register():
             )
 
             flash('Registration successful! Please log in.', 'success')
-            return redirect(url_for('index'))
+            return redirect(url_for('.index'))
 
         except Exception as e:
             current_app.logger.exception("Registration error")
@@ -164,7 +334,7 @@ def register():
     return render_template('register.html')
 
 
-@app.route('/upload', methods=['GET', 'POST'])
+@main.route('/upload', methods=['GET', 'POST'])
 @login_required
 def upload_pdf():
     """
@@ -180,35 +350,39 @@ def upload_pdf():
             flash('Please select a valid PDF file to upload.', 'warning')
             return render_template('upload_pdf.html')
 
-        blob = uploaded_file.read()
-        if not blob:
-            flash('Uploaded file appears to be empty.', 'warning')
-            return render_template('upload_pdf.html')
+        # Spool the upload to disk in chunks, hashing on the fly, instead of reading it into memory
+        tmp_path, size, digest = _spool_upload(uploaded_file.stream)
+        try:
+            if not size:
+                flash('Uploaded file appears to be empty.', 'warning')
+                return render_template('upload_pdf.html')
 
-        pid = generate_unique_id()
-        now = datetime.now(timezone.utc)
+            pid = generate_unique_id()
+            now = datetime.now(timezone.utc)
 
-        try:
-            data_manager.pdf_manager.add_pdf(
+            data_manager.pdf_manager.add_pdf_file(
                 id=pid,
                 user_id=current_user.id,
                 original_filename=uploaded_file.filename,
                 upload_date=now,
-                raw_pdf_blob=blob,
-                processing_status='uploaded'
+                path=tmp_path,
+                processing_status='uploaded',
+                content_sha256=digest
             )
-            return redirect(url_for('process_pdf', pdf_id=pid))
+            return redirect(url_for('.process_pdf', pdf_id=pid))
 
         except Exception as e:
             current_app.logger.exception("Upload error")
             flash('Failed to save PDF. Please try again later.', 'danger')
             return render_template('upload_pdf.html')
+        finally:
+            os.remove(tmp_path)
 
     # GET request
     return render_template('upload_pdf.html')
 
 
-@app.route('/process/<pdf_id>', methods=['GET', 'POST'])
+@main.route('/process/<pdf_id>', methods=['GET', 'POST'])
 @login_required
 def process_pdf(pdf_id):
     try:
@@ -218,60 +392,23 @@ def process_pdf(pdf_id):
 
         data_manager.pdf_manager.update_processing_status(pdf_id, 'processing')
 
-        extracted = extract_pdf_content(entry.raw_pdf_blob, lang="deu")
-        if not extracted.get('raw_text'):
-            raise ValueError("No usable text extracted.")
-
-        # This now creates the prompt asking for both EN and DE content
-        prompt = build_prompt(extracted)
-
-        # Assume call_openai/gemini return a dict with the new keys
-        oa = call_openai(prompt)
-        gm = call_gemini(prompt)
-
-        proc_id = generate_unique_id()
-        now = datetime.now(timezone.utc)
-
-        seqs = oa.get('sequences', [])
-        seqs = ", ".join(seqs) if isinstance(seqs, list) else seqs
-
-        # Pass the EN and DE data directly from the AI response to your data manager
-        data_manager.processed_manager.add_processed_data(
-            id=proc_id,
-            pdf_data_id=pdf_id,
-            company_name=oa.get('company'),
-            sequences=seqs,
-            method_used=oa.get('method'),
-            body_region=oa.get('region'),
-            modality=oa.get('modality'),
-
-            # English Reports from API
-            report_section_short_openai=oa.get('short_text_en'),
-            report_section_long_openai=oa.get('long_text_en'),
-            report_section_short_gemini=gm.get('short_text_en'),
-            report_section_long_gemini=gm.get('long_text_en'),
-
-            # German Reports from API
-            report_section_short_openai_de=oa.get('short_text_de'),
-            report_section_long_openai_de=oa.get('long_text_de'),
-            report_section_short_gemini_de=gm.get('short_text_de'),
-            report_section_long_gemini_de=gm.get('long_text_de'),
-
-            report_quality_score=oa.get('quality'),
-            created_at=now
-        )
+        # OCR -> prompt -> provider calls, reusing any stage artifacts still current
+        proc_id = process_document(entry, data_manager)
 
         data_manager.pdf_manager.update_processing_status(pdf_id, 'processed')
-        return redirect(url_for('view_report', processed_id=proc_id))
+        if current_app.config['SECONDARY_PROVIDER_MODE'] == 'background' and deferred_stages(current_app.config):
+            request_secondary(current_app._get_current_object(), data_manager._get_current_object(),
+                              pdf_id, PRIORITY_BATCH)
+        return redirect(url_for('.view_report', processed_id=proc_id))
 
     except Exception as exc:
         current_app.logger.exception("Processing error on PDF %s", pdf_id)
         _log_pdf_error(pdf_id, exc)
         flash("An error occurred. See error log.", "warning")
-        return redirect(url_for('error_log', pdf_id=pdf_id))
+        return redirect(url_for('.error_log', pdf_id=pdf_id))
 
 
-@app.route('/status', methods=['GET'])
+@main.route('/status', methods=['GET'])
 @login_required
 def status():
     """
@@ -279,16 +416,80 @@ def status():
     - Show current user’s uploads and their processing status.
     - Report links load on demand; errors are accessible separately.
     """
+    # Taken before the query, so polling resumes from what this page shows
+    cursor = _status_cursor()
     try:
         uploads = data_manager.pdf_manager.get_pdfs_by_user(current_user.id)
     except Exception as e:
         current_app.logger.exception("Status error: %s", e)
         flash('Could not load your uploads. Please try again later.', 'danger')
         uploads = []
-    return render_template('status.html', uploads=uploads)
+    return render_template('status.html', uploads=uploads, cursor=cursor, poll_seconds=STATUS_POLL_SECONDS)
+
+
+def _status_cursor() -> str:
+    return datetime.now(timezone.utc).replace(tzinfo=None).isoformat()
+
+
+@main.route('/api/status', methods=['GET'])
+@login_required
+def status_changes():
+    """
+    Status API Route:
+    - Return the current user's uploads added or changed since `since`
+      (the `cursor` of the previous response or of the rendered page).
+    - Responses overlap by STATUS_CURSOR_OVERLAP; clients upsert rows by id.
+    """
+    try:
+        since = datetime.fromisoformat(request.args['since'])
+    except (KeyError, ValueError):
+        return jsonify(error="Query arg 'since' must be an ISO 8601 timestamp."), 400
+    if since.tzinfo is not None:
+        since = since.astimezone(timezone.utc).replace(tzinfo=None)
+
+    cursor = _status_cursor()
+    try:
+        changed = data_manager.pdf_manager.get_pdfs_changed_since(current_user.id, since - STATUS_CURSOR_OVERLAP)
+    except Exception as e:
+        current_app.logger.exception("Status API error: %s", e)
+        return jsonify(error='Could not load your uploads.'), 500
+
+    return jsonify(
+        uploads=[{
+            'id': pdf.id,
+            'original_filename': pdf.original_filename,
+            'upload_date': pdf.upload_date.strftime('%Y-%m-%d %H:%M'),
+            'processing_status': pdf.processing_status,
+            'report_url': url_for('.view_report_by_pdf_id', pdf_id=pdf.id),
+            'error_url': url_for('.error_log', pdf_id=pdf.id),
+        } for pdf in changed],
+        cursor=cursor,
+    )
+
+
+@main.route('/api/processing/memory', methods=['GET'])
+@login_required
+def processing_memory():
+    """
+    Processing Memory API Route:
+    - Return the usage of this worker process's OCR memory budget: budget,
+      reserved and peak MB, running and queued reservations, and totals.
+    """
+    return jsonify(memory_budget.usage())
+
+
+@main.route('/api/processing/hedging', methods=['GET'])
+@login_required
+def processing_hedging():
+    """
+    Processing Hedging API Route:
+    - Return the hedged provider calls of this worker process: calls, how
+      many were hedged, the hedge rate, wins per provider and failures.
+    """
+    return jsonify(hedge_stats.snapshot())
 
 
-@app.route('/errors/<pdf_id>', methods=['GET'])
+@main.route('/errors/<pdf_id>', methods=['GET'])
 @login_required
 def error_log(pdf_id):
     """
@@ -318,10 +519,10 @@ def error_log(pdf_id):
     except Exception as e:
         current_app.logger.exception("Error log view failed: %s", e)
         flash('Unable to load error log. Please try again later.', 'danger')
-        return redirect(url_for('status'))
+        return redirect(url_for('.status'))
 
 
-@app.route('/errors/<pdf_id>/clear', methods=['POST'])
+@main.route('/errors/<pdf_id>/clear', methods=['POST'])
 @login_required
 def clear_errors(pdf_id):
     """
@@ -340,9 +541,9 @@ def clear_errors(pdf_id):
         current_app.logger.exception("Failed to clear error logs: %s", e)
         flash('Could not clear error logs. Please try again.', 'danger')
 
-    return redirect(url_for('error_log', pdf_id=pdf_id))
+    return redirect(url_for('.error_log', pdf_id=pdf_id))
 
-@app.route('/profile', methods=['GET', 'POST'])
+@main.route('/profile', methods=['GET', 'POST'])
 @login_required
 def profile():
     """
@@ -365,57 +566,126 @@ def profile():
                     flash('Profile updated successfully.', 'success')
                 else:
                     flash('No changes were applied.', 'info')
-            return redirect(url_for('profile'))
+            return redirect(url_for('.profile'))
         except Exception as e:
             current_app.logger.exception("Profile update error: %s", e)
             flash('Could not update profile. Please try again later.', 'danger')
-            return redirect(url_for('profile'))
+            return redirect(url_for('.profile'))
 
     return render_template('profile.html', user=current_user)
 
 
-@app.route('/view_report/<processed_id>', methods=['GET'])
+@main.route('/view_report/<processed_id>', methods=['GET'])
 @login_required
 def view_report(processed_id):
     """
     View Route:
     - Display the AI-generated structured report (short + long, meta info).
+    - Revalidated with an ETag, so unchanged reports are answered with 304
+      without loading or rendering them again.
+    - Sections of deferred providers that were not generated yet are
+      requested here (before revalidation, so a failed attempt is retried
+      on reload) and shown as pending or failed; that state is part of the
+      ETag. The page polls report_sections and reloads once they are stored
+      (which changes the ETag).
     """
     try:
-        report = data_manager.processed_manager.get_processed_data(processed_id)
+        deferred = deferred_stages(current_app.config)
+        info = data_manager.processed_manager.get_report_cache_info(
+            processed_id, [column for stage in deferred for column in PROVIDER_COLUMNS[stage]]
+        )
         # Ownership check
-        if not report or report.pdf_data.user_id != current_user.id:
+        if not info or info.user_id != current_user.id:
             abort(404)
-        return render_template('view_report.html', report=report)
+
+        pending = missing_sections(info, deferred)
+        secondary = None
+        if pending:
+            secondary = request_secondary(
+                current_app._get_current_object(), data_manager._get_current_object(), info.pdf_data_id
+            )
+
+        modified = info.updated_at or info.created_at
+        etag = hashlib.sha256(
+            f"{info.id}:{modified.isoformat()}:{secondary or 'complete'}:{REPORT_TEMPLATE_HASH}".encode()
+        ).hexdigest()
+        if _not_modified(etag, modified):
+            return _apply_cache_headers(Response(status=304), etag, modified)
+
+        report = data_manager.processed_manager.get_processed_data(processed_id)
+        response = make_response(render_template(
+            'view_report.html', report=report, pending_providers=pending, secondary_state=secondary
+        ))
+        return _apply_cache_headers(response, etag, modified)
     except Exception as e:
         current_app.logger.exception("View report error: %s", e)
         flash('Unable to load the report. Please try again later.', 'danger')
-        return redirect(url_for('status'))
+        return redirect(url_for('.status'))
+
+
+@main.route('/api/reports/<processed_id>/sections', methods=['GET'])
+@login_required
+def report_sections(processed_id):
+    """
+    Deferred Sections API Route:
+    - {'status': 'ready'} once every provider's sections are stored,
+      otherwise 'pending' (generation requested or running) or 'failed'.
+    """
+    try:
+        deferred = deferred_stages(current_app.config)
+        info = data_manager.processed_manager.get_report_cache_info(
+            processed_id, [column for stage in deferred for column in PROVIDER_COLUMNS[stage]]
+        )
+        if not info or info.user_id != current_user.id:
+            return jsonify(error='Report not found.'), 404
+        if not missing_sections(info, deferred):
+            return jsonify(status='ready')
+        status = request_secondary(
+            current_app._get_current_object(), data_manager._get_current_object(), info.pdf_data_id
+        )
+        return jsonify(status=status)
+    except Exception as e:
+        current_app.logger.exception("Report sections error: %s", e)
+        return jsonify(error='Could not check the report.'), 500
 
 
-@app.route('/pdf/<pdf_id>')
+@main.route('/pdf/<pdf_id>')
 @login_required
 def serve_pdf(pdf_id):
     """
     PDF Serve Route:
     - Return the original uploaded PDF in-browser.
+    - The content hash is a strong ETag; conditional requests get a 304
+      without reading the blob, and Range requests are answered with 206
+      so the browser viewer can load pages incrementally.
     """
     try:
-        entry = data_manager.pdf_manager.get_pdf(pdf_id)
-        if not entry or entry.user_id != current_user.id:
+        info = data_manager.pdf_manager.get_pdf_cache_info(pdf_id)
+        if not info or info.user_id != current_user.id:
             abort(404)
-        return Response(
-            entry.raw_pdf_blob,
-            mimetype='application/pdf',
-            headers={"Content-Disposition": f"inline; filename={entry.original_filename}"}
-        )
+
+        if _not_modified(info.content_sha256, info.upload_date):
+            response = Response(status=304)
+        else:
+            # Serve from a spooled copy so the blob is streamed, not held in memory;
+            # the copy is shared by all (Range) requests for the same content
+            pdf_path = data_manager.pdf_manager.spooled_pdf(pdf_id, info.content_sha256)
+            response = send_file(
+                pdf_path,
+                mimetype='application/pdf',
+                download_name=info.original_filename,
+                conditional=True,
+                etag=info.content_sha256,
+                last_modified=info.upload_date,
+            )
+        return _apply_cache_headers(response, info.content_sha256, info.upload_date, PDF_CACHE_MAX_AGE)
     except Exception as e:
         current_app.logger.exception("Serve PDF error: %s", e)
         flash('Could not load PDF. Please try again later.', 'danger')
-        return redirect(url_for('status'))
+        return redirect(url_for('.status'))
 
 
-@app.route('/view_report_by_pdf/<pdf_id>', methods=['GET'])
+@main.route('/view_report_by_pdf/<pdf_id>', methods=['GET'])
 @login_required
 def view_report_by_pdf_id(pdf_id):
     """
@@ -426,14 +696,135 @@ def view_report_by_pdf_id(pdf_id):
         processed = data_manager.processed_manager.get_by_pdf_id(pdf_id)
         if not processed or processed.pdf_data.user_id != current_user.id:
             abort(404)
-        return redirect(url_for('view_report', processed_id=processed.id))
+        return redirect(url_for('.view_report', processed_id=processed.id))
     except Exception as e:
         current_app.logger.exception("Redirect to report failed: %s", e)
         flash('Could not find the report. Please try again later.', 'danger')
-        return redirect(url_for('status'))
+        return redirect(url_for('.status'))
+
+
+@main.route('/search', methods=['GET'])
+@login_required
+def search_reports():
+    """
+    Search Route:
+    - Full-text search over the current user's generated reports.
+    - Query args: q, lang ('en'/'de'), company, modality, region, page.
+    """
+    query    = (request.args.get('q') or '').strip()
+    lang     = request.args.get('lang') if request.args.get('lang') in ('en', 'de') else None
+    company  = (request.args.get('company') or '').strip() or None
+    modality = (request.args.get('modality') or '').strip() or None
+    region   = (request.args.get('region') or '').strip() or None
+    page     = max(request.args.get('page', 1, type=int), 1)
+    per_page = 20
+
+    results = []
+    if query:
+        try:
+            results = data_manager.search_manager.search(
+                query,
+                user_id=current_user.id,
+                lang=lang,
+                company_name=company,
+                modality=modality,
+                body_region=region,
+                limit=per_page,
+                offset=(page - 1) * per_page,
+            )
+        except Exception as e:
+            current_app.logger.exception("Report search failed: %s", e)
+            flash('Search failed. Please try again later.', 'danger')
+
+    return render_template(
+        'search.html',
+        results=results,
+        query=query,
+        lang=lang,
+        company=company,
+        modality=modality,
+        region=region,
+        page=page,
+        per_page=per_page,
+    )
+
+
+@main.route('/api/findings', methods=['GET'])
+@login_required
+def query_findings():
+    """
+    Findings API Route:
+    - Filter the current user's structured findings across all reports.
+    - Query args: type, location, unit, min_value, max_value, min_percentile,
+      max_percentile, company, modality, region, after (keyset cursor), limit.
+    """
+    args = request.args
+    try:
+        findings = data_manager.finding_manager.query_findings(
+            finding_type=args.get('type'),
+            location=args.get('location'),
+            unit=args.get('unit'),
+            min_value=args.get('min_value', type=float),
+            max_value=args.get('max_value', type=float),
+            min_percentile=args.get('min_percentile', type=float),
+            max_percentile=args.get('max_percentile', type=float),
+            user_id=current_user.id,
+            company_name=args.get('company'),
+            modality=args.get('modality'),
+            body_region=args.get('region'),
+            after_id=args.get('after'),
+            limit=max(1, min(args.get('limit', 100, type=int), 1000)),
+        )
+    except Exception as e:
+        current_app.logger.exception("Findings query failed: %s", e)
+        return jsonify(error='Could not query findings.'), 500
+
+    return jsonify(
+        findings=[{
+            'id': f.id,
+            'processed_data_id': f.processed_data_id,
+            'type': f.finding_type,
+            'location': f.location,
+            'value': f.value,
+            'unit': f.unit,
+            'percentile': f.percentile,
+            'significance': f.significance,
+        } for f in findings],
+        next=findings[-1].id if findings else None,
+    )
+
+
+@main.route('/export', methods=['GET'])
+@login_required
+def export_data():
+    """
+    Export Route:
+    - Stream the current user's reports or findings as a file download.
+    - Query args: kind ('reports'/'findings'), format ('csv'/'jsonl'/'parquet'),
+      start, end (YYYY-MM-DD, inclusive).
+    """
+    kind = request.args.get('kind', 'reports')
+    fmt  = request.args.get('format', 'csv')
+    if fmt not in EXPORT_FORMATS or kind not in ('reports', 'findings'):
+        abort(400)
+    try:
+        start, end = _parse_date_range(request.args.get('start'), request.args.get('end'))
+    except ValueError:
+        abort(400)
+
+    source   = _export_source(kind)
+    rows     = source.iter_export_rows(start=start, end=end, user_id=current_user.id)
+    mimetype, ext = EXPORT_FORMATS[fmt]
+    filename = f"medimage2report_{kind}_{datetime.now(timezone.utc):%Y%m%d}.{ext}"
 
+    return Response(
+        stream_with_context(stream_export(rows, source.EXPORT_COLUMNS, fmt)),
+        mimetype=mimetype,
+        headers={"Content-Disposition": f"attachment; filename={filename}"}
+    )
 
-@app.route('/logout')
+
+@main.route('/logout')
 @login_required
 def logout():
     """
@@ -442,7 +833,155 @@ def logout():
     """
     logout_user()
     flash('You have been logged out.', 'info')
-    return redirect(url_for('index'))
+    return redirect(url_for('.index'))
+
+
+# -----------------------------------------------------------------------------
+# CLI commands
+# -----------------------------------------------------------------------------
+@main.cli.command('export')
+@click.option('--kind', type=click.Choice(['reports', 'findings']), default='reports')
+@click.option('--format', 'fmt', type=click.Choice(list(EXPORT_FORMATS)), default='csv')
+@click.option('--start', help='First day to include (YYYY-MM-DD).')
+@click.option('--end', help='Last day to include (YYYY-MM-DD).')
+@click.option('--user', 'user_id', help='Only export uploads of this user id.')
+@click.option('--batch-size', default=500, show_default=True)
+@click.option('--output', '-o', default='-', help="Output file, '-' for stdout.")
+def export_command(kind, fmt, start, end, user_id, batch_size, output):
+    """
+    Stream processed reports or findings for a date range to a file.
+    """
+    start_dt, end_dt = _parse_date_range(start, end)
+    source = _export_source(kind)
+    rows   = source.iter_export_rows(start=start_dt, end=end_dt, user_id=user_id, batch_size=batch_size)
+    chunks = stream_export(rows, source.EXPORT_COLUMNS, fmt, batch_size=batch_size)
+
+    out = sys.stdout.buffer if output == '-' else open(output, 'wb')
+    try:
+        for chunk in chunks:
+            out.write(chunk)
+    finally:
+        if out is not sys.stdout.buffer:
+            out.close()
+
+
+@main.cli.command('reprocess')
+@click.option('--stage', 'stages', multiple=True, type=click.Choice(STAGES),
+              help='Recompute this stage (and the stages that consume its output) even if current.')
+@click.option('--workers', default=4, show_default=True, help='PDFs processed in parallel.')
+@click.option('--dry-run', is_flag=True, help='Only list the PDFs that would be reprocessed.')
+def reprocess_command(stages, workers, dry_run):
+    """
+    Recompute outdated pipeline stages for every stored PDF.
+
+    A stage is outdated when its code or configuration changed since its
+    artifact was stored (see app/services/pipeline.py); unchanged stages
+    are reused, so e.g. a prompt change does not repeat the OCR.
+    """
+    from concurrent.futures import ThreadPoolExecutor, as_completed
+
+    app = current_app._get_current_object()
+    versions = stage_versions()
+    deferred = deferred_stages(app.config)
+    forced = set()
+    for stage in stages:
+        forced.update(dependent_stages(stage))
+
+    todo = []
+    for pdf_id, in db.session.execute(db.select(ImageAnalysisPDF.id)).all():
+        stale = set(stale_stages(pdf_id, data_manager, versions, deferred))
+        if forced or stale:
+            todo.append((pdf_id, sorted(forced or stale, key=STAGES.index)))
+    click.echo(f"{len(todo)} PDF(s) need reprocessing.")
+    if dry_run:
+        for pdf_id, stale in todo:
+            click.echo(f"  {pdf_id}: {', '.join(stale)}")
+        return
+
+    def run_one(pdf_id):
+        request_priority.set(PRIORITY_BATCH)
+        with app.app_context():
+            entry = data_manager.pdf_manager.get_pdf(pdf_id)
+            # Deferred sections are only regenerated where they had been generated before
+            stored = data_manager.artifact_manager.get_versions(pdf_id)
+            providers = [s for s in PROVIDER_STAGES if s not in deferred or stored.get(s)]
+            try:
+                process_document(entry, data_manager, force=forced, hedging=False, providers=providers)
+                data_manager.pdf_manager.update_processing_status(pdf_id, 'processed')
+            except Exception as exc:
+                logging.exception("Reprocessing failed for PDF %s", pdf_id)
+                _log_pdf_error(pdf_id, exc)
+                raise
+
+    failed = 0
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(run_one, pdf_id): pdf_id for pdf_id, _ in todo}
+        for future in as_completed(futures):
+            if future.exception():
+                failed += 1
+                click.echo(f"  failed: {futures[future]} ({future.exception()})")
+    click.echo(f"Reprocessed {len(todo) - failed} PDF(s), {failed} failed.")
+
+
+@main.cli.command('backfill')
+@click.argument('source', type=click.Path(exists=True))
+@click.option('--user', 'user_email', required=True, help='Email of the user the PDFs are stored for.')
+@click.option('--checkpoint', 'checkpoint_path',
+              help='JSONL checkpoint file (default: <source>.backfill.jsonl); re-run to resume.')
+@click.option('--ocr-workers', type=int, help='OCR processes (default: one per CPU).')
+@click.option('--provider-workers', default=4, show_default=True, help='Documents in the provider stage at once.')
+@click.option('--lang', default='auto', show_default=True, help="OCR language(s), or 'auto' to detect per page.")
+def backfill_command(source, user_email, checkpoint_path, ocr_workers, provider_workers, lang):
+    """
+    Import and process an archive of PDFs from a directory or manifest file.
+
+    SOURCE is a directory (searched recursively for *.pdf) or a text file
+    listing one PDF path per line.
+    """
+    user = data_manager.user_manager.get_user_by_email(user_email)
+    if user is None:
+        raise click.BadParameter(f"No user with email {user_email}.", param_hint='--user')
+
+    paths = discover_pdfs(source)
+    checkpoint = Checkpoint(checkpoint_path or f"{source.rstrip(os.sep)}.backfill.jsonl")
+    click.echo(f"{len(paths)} PDF(s) found, checkpoint {checkpoint.path}.")
+    try:
+        stats = run_backfill(
+            current_app._get_current_object(), data_manager._get_current_object(), paths, user.id, checkpoint,
+            ocr_workers=ocr_workers, provider_workers=provider_workers, lang=lang, echo=click.echo
+        )
+    finally:
+        checkpoint.close()
+    click.echo(stats.summary())
+    if stats.failures:
+        sys.exit(1)
+
+
+@main.cli.command('purge')
+@click.option('--days', type=int, help='Delete uploads older than this (default: RETENTION_DAYS).')
+@click.option('--error-days', type=int, help='Delete error logs older than this (default: ERROR_LOG_RETENTION_DAYS).')
+@click.option('--batch-size', default=200, show_default=True, help='Uploads deleted per transaction.')
+@click.option('--full-vacuum', is_flag=True,
+              help='Run a full VACUUM afterwards (also enables incremental vacuum on older databases).')
+@click.option('--dry-run', is_flag=True, help='Only count the uploads that would be deleted.')
+def purge_command(days, error_days, batch_size, full_vacuum, dry_run):
+    """
+    Delete uploads and error logs past their retention period.
+    """
+    days = current_app.config['RETENTION_DAYS'] if days is None else days
+    error_days = current_app.config['ERROR_LOG_RETENTION_DAYS'] if error_days is None else error_days
+    if dry_run:
+        count = data_manager.pdf_manager.count_uploaded_before(retention_cutoff(days)) if days else 0
+        click.echo(f"{count} upload(s) older than {days} day(s) would be deleted.")
+        return
+
+    stats = purge_expired(data_manager, days, error_days, batch_size=batch_size, vacuum=not full_vacuum)
+    if full_vacuum:
+        stats['pages_released'] = data_manager.vacuum(full=True)
+    click.echo(
+        f"Deleted {stats['uploads']} upload(s), {stats['error_logs']} error log(s) and "
+        f"{stats['page_cache']} page cache entries; released {stats['pages_released']} page(s)."
+    )
 
 
 if __name__ == "__main__":
@@ -450,5 +989,5 @@ if __name__ == "__main__":
     host = os.getenv('FLASK_RUN_HOST', '0.0.0.0')
     port = int(os.getenv('FLASK_RUN_PORT', 5005))
     debug = os.getenv('FLASK_DEBUG', 'true').lower() in ('1', 'true', 'yes')
-    app.run(debug=debug, host=host, port=port)
+    create_app().run(debug=debug, host=host, port=port)
 
@@ -0,0 +1,34 @@
+import pytest
+
+from app.services.json_repair import loads_tolerant, repair_json
+
+
+@pytest.mark.parametrize("text, expected", [
+    # Truncated inside the last value: only that field is dropped
+    ('{"short_text_en":"a","findings":[{"type":"x"}],"quality":"goo',
+     {"short_text_en": "a", "findings": [{"type": "x"}]}),
+    ('{"a":{"b":1},"c":[1,2', {"a": {"b": 1}}),
+    ('{"a":"x}y","b":"tru', {"a": "x}y"}),
+    ('{"a":[{"b":1}],"c":{"d":"e}', {"a": [{"b": 1}]}),
+    ('{"a":1,"b":12', {"a": 1}),
+    ('{"a":1,"b":tr', {"a": 1}),
+    # Truncated between fields or inside the next key: all values are complete
+    ('{"a":1,"b":[1,2],', {"a": 1, "b": [1, 2]}),
+    ('{"a":1,"b":"x","c', {"a": 1, "b": "x"}),
+    # Complete objects are kept whole
+    ('Here it is: {"a":{"b":"}"},"c":"d"} Hope this helps!', {"a": {"b": "}"}, "c": "d"}),
+    ('```json\n{"a":"ok",}\n```', {"a": "ok"}),
+    ('{"a":"line\nbreak","b":"c\\m"}', {"a": "line\nbreak", "b": "cm"}),
+])
+def test_loads_tolerant(text, expected):
+    assert loads_tolerant(text) == expected
+
+
+def test_repair_json_closes_truncated_object():
+    assert repair_json('{"a":{"b":1},"c":[1,2') == '{"a":{"b":1},"c":[1,2]}'
+
+
+@pytest.mark.parametrize("text", ["no json here", '["a", "b"]'])
+def test_loads_tolerant_rejects_non_objects(text):
+    with pytest.raises(ValueError):
+        loads_tolerant(text)
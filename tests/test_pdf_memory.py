@@ -0,0 +1,92 @@
+"""
+Peak-memory check for the upload -> store -> OCR rendering path.
+
+Builds a 50-page PDF (text plus a full-page scan-like image per page),
+stores it through PDFDataManager.add_pdf_file, spools it back and runs
+extract_pdf_content on the file, then asserts that the peak RSS of the
+test process stays under MAX_RSS_MB (default 350). Tesseract runs as a
+separate process, so this measures our own buffers (upload chunks, blob
+I/O, MuPDF rendering, PIL preprocessing) and not the OCR engine.
+"""
+import os
+import random
+import resource
+import shutil
+import sys
+from datetime import datetime, timezone
+
+import pytest
+
+fitz = pytest.importorskip("fitz")
+pytest.importorskip("pytesseract")
+
+from flask import Flask  # noqa: E402
+
+from app.services import pdf_processing  # noqa: E402
+from data.sqlite_data_manager import DataManagerInterface  # noqa: E402
+from utils.helpers import generate_unique_id  # noqa: E402
+
+PAGES = 50
+MAX_RSS_MB = float(os.getenv("MAX_RSS_MB", 350))
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    scale = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale
+
+
+def build_pdf(path: str, pages: int):
+    rng = random.Random(0)
+    doc = fitz.open()
+    for number in range(pages):
+        page = doc.new_page()
+        # Noisy grayscale image covering the page, like a scanned report
+        pix = fitz.Pixmap(fitz.csGRAY, fitz.IRect(0, 0, 600, 850), False)
+        pix.set_rect(pix.irect, (255,))
+        for _ in range(2000):
+            x, y = rng.randrange(600), rng.randrange(850)
+            pix.set_rect(fitz.IRect(x, y, x + 6, y + 2), (rng.randrange(0, 160),))
+        page.insert_image(page.rect, pixmap=pix)
+        page.insert_text((72, 72), f"Befund Seite {number + 1}: Volumetrie der Hippocampi ohne Auffälligkeiten.")
+    doc.save(path, deflate=True)
+    doc.close()
+
+
+@pytest.fixture
+def tesseract(monkeypatch):
+    cmd = pdf_processing.TESSERACT_CMD
+    if not os.access(cmd, os.X_OK):
+        cmd = shutil.which("tesseract")
+        if cmd is None:
+            pytest.skip("tesseract is not installed")
+        monkeypatch.setattr(pdf_processing, "TESSERACT_CMD", cmd)
+    return cmd
+
+
+def test_extract_peak_rss_under_ceiling(tmp_path, tesseract):
+    pdf_path = str(tmp_path / "report.pdf")
+    build_pdf(pdf_path, PAGES)
+
+    app = Flask(__name__)
+    data_manager = DataManagerInterface(str(tmp_path / "memory.db"), app)
+    with app.app_context():
+        pdf_id = generate_unique_id()
+        data_manager.pdf_manager.add_pdf_file(
+            id=pdf_id,
+            user_id=generate_unique_id(),
+            original_filename="report.pdf",
+            upload_date=datetime.now(timezone.utc),
+            path=pdf_path,
+            processing_status="uploaded",
+            content_sha256=pdf_processing._file_sha256(pdf_path),
+        )
+        spooled = data_manager.pdf_manager.spool_pdf(pdf_id)
+        try:
+            result = pdf_processing.extract_pdf_content(spooled, lang="deu")
+        finally:
+            os.remove(spooled)
+
+    assert len(result["pages"]) == PAGES
+    peak = peak_rss_mb()
+    assert peak <= MAX_RSS_MB, f"peak RSS {peak:.0f} MB above the {MAX_RSS_MB:.0f} MB ceiling at {pdf_processing.OCR_DPI} DPI"
@@ -0,0 +1,41 @@
+from app.services.pdf_processing import _complete_report, _invalid_fields
+
+REQUIRED = {
+    "short_text_en": "Short.",
+    "long_text_en": "Long.",
+    "short_text_de": "Kurz.",
+    "long_text_de": "Lang.",
+}
+
+
+def test_invalid_fields_checks_optional_types():
+    data = dict(
+        REQUIRED,
+        company=None,
+        sequences="T1, T2",
+        method=["volumetry"],
+        findings=[{"type": "volume", "location": "Hippocampus left", "value": 3.42}],
+    )
+    assert _invalid_fields(data, ["company", "sequences", "method", "region", "findings"]) == [
+        "sequences", "method", "findings",
+    ]
+
+
+def test_invalid_fields_requires_non_empty_texts():
+    assert _invalid_fields(dict(REQUIRED, long_text_de="  "), list(REQUIRED)) == ["long_text_de"]
+    assert _invalid_fields({}, ["short_text_en", "company"]) == ["short_text_en"]
+
+
+def test_complete_report_re_requests_and_drops_malformed_optional_fields():
+    requests = []
+
+    def request_json(text, fields):
+        requests.append(fields)
+        if fields is None:
+            return dict(REQUIRED, findings="none", region=["Brain"])
+        return {"findings": [], "region": 7}
+
+    data = _complete_report(request_json, "prompt", "Test", fan_out=False)
+    assert requests == [None, ["region", "findings"]]
+    assert data["findings"] == []
+    assert "region" not in data
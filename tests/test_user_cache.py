@@ -0,0 +1,43 @@
+from types import SimpleNamespace
+
+from data.user_cache import UserCache
+
+
+def _user(name):
+    return SimpleNamespace(id="u1", email="u1@example.com", name=name, role=None, created_at=None, last_login=None)
+
+
+def test_get_caches_loaded_user():
+    cache = UserCache()
+    loads = []
+
+    def loader(user_id):
+        loads.append(user_id)
+        return _user("Old")
+
+    assert cache.get("u1", loader).name == "Old"
+    assert cache.get("u1", loader).name == "Old"
+    assert loads == ["u1"]
+
+
+def test_get_skips_insert_when_invalidated_during_load():
+    cache = UserCache()
+
+    def racing_loader(user_id):
+        # The user is updated (and invalidated) after this row was read
+        cache.invalidate(user_id)
+        return _user("Old")
+
+    assert cache.get("u1", racing_loader).name == "Old"
+    assert cache.get("u1", lambda user_id: _user("New")).name == "New"
+
+
+def test_get_skips_insert_when_cleared_during_load():
+    cache = UserCache()
+
+    def racing_loader(user_id):
+        cache.clear()
+        return _user("Old")
+
+    cache.get("u1", racing_loader)
+    assert cache.get("u1", lambda user_id: _user("New")).name == "New"